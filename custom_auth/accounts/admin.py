@@ -1,6 +1,13 @@
 from django.contrib import admin
 from django.contrib.admin import AdminSite
-from .models import User, Role, BusinessElement, AccessRoleRule, UserSession
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Now
+from django.utils.functional import cached_property
+from .models import User, Role, BusinessElement, AccessRoleRule, UserSession, AuthEvent
+from .permission_editor import GRANT, REVOKE, apply_matrix, clone_role
+from .permissions import CREATE, DELETE, DELETE_ALL, READ, READ_ALL, UPDATE, UPDATE_ALL
 from django.utils.html import format_html
 
 # Кастомизация заголовка админки
@@ -11,11 +18,74 @@ class CustomAdminSite(AdminSite):
 
 custom_admin_site = CustomAdminSite(name='custom_admin')
 
+
+# Пагинация для больших таблиц
+class LargeTablePaginator(Paginator):
+    """
+    Для таблиц с миллионами строк:
+    - без фильтров берёт оценку числа строк из статистики PostgreSQL вместо COUNT(*);
+    - при сортировке по id ищет границу страницы по индексу первичного ключа
+      и читает страницу через WHERE id <= граница (keyset), а не большим OFFSET
+      по полным строкам с JOIN.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return row[0]
+        return super().count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        queryset = self.object_list
+        ordering = tuple(queryset.query.order_by)
+        if not bottom or ordering not in (('-pk',), ('pk',)):
+            return super().page(number)
+
+        boundary = list(queryset.values_list('pk', flat=True)[bottom:bottom + 1])
+        if not boundary:
+            return self._get_page(queryset.none(), number, self)
+        lookup = 'pk__lte' if ordering == ('-pk',) else 'pk__gte'
+        page_items = queryset.filter(**{lookup: boundary[0]})[:self.per_page]
+        return self._get_page(page_items, number, self)
+
+
+class SessionActiveFilter(admin.SimpleListFilter):
+    """Фильтр активности по индексу expires_at на стороне БД"""
+    title = 'Is Active'
+    parameter_name = 'active'
+
+    def lookups(self, request, model_admin):
+        return (('1', 'Yes'), ('0', 'No'))
+
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.filter(expires_at__gt=Now())
+        if self.value() == '0':
+            return queryset.filter(expires_at__lte=Now())
+        return queryset
+
 # Кастомизация отображения пользователей
 class UserAdmin(admin.ModelAdmin):
     list_display = ('email', 'get_full_name', 'role', 'is_active', 'last_login')
     list_filter = ('is_active', 'role', 'created_at')
+    list_select_related = ('role',)
     search_fields = ('email', 'first_name', 'last_name')
+    autocomplete_fields = ('role',)
+    ordering = ('-pk',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
     readonly_fields = ('created_at', 'last_login')
     fieldsets = (
         (None, {
@@ -38,9 +108,26 @@ class UserAdmin(admin.ModelAdmin):
 
 # Кастомизация отображения ролей
 class RoleAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description_short')
+    list_display = ('name', 'parent', 'description_short')
+    list_select_related = ('parent',)
     search_fields = ('name', 'description')
+    autocomplete_fields = ('parent',)
+    actions = ('clone_roles',)
     
+    def clone_roles(self, request, queryset):
+        taken = set(Role.objects.values_list('name', flat=True))
+        for role in queryset:
+            name = base = f"{role.name} (copy)"[:50]
+            counter = 2
+            while name in taken:
+                suffix = f" {counter}"
+                name = base[:50 - len(suffix)] + suffix
+                counter += 1
+            taken.add(name)
+            clone_role(role, name)
+        self.message_user(request, f"Cloned {queryset.count()} role(s) with their access rules")
+    clone_roles.short_description = 'Clone selected roles with access rules'
+
     def description_short(self, obj):
         return obj.description[:50] + '...' if len(obj.description) > 50 else obj.description
     description_short.short_description = 'Description'
@@ -54,14 +141,21 @@ class AccessRoleRuleAdmin(admin.ModelAdmin):
         'create_permission', 
         'update_permission', 
         'delete_permission',
+        'read_all_permission',
+        'update_all_permission',
+        'delete_all_permission',
         'permissions_display'
     )
     list_filter = ('role', 'element')
+    list_select_related = ('role', 'element')
     list_editable = (
         'read_permission', 
         'create_permission', 
         'update_permission', 
-        'delete_permission'
+        'delete_permission',
+        'read_all_permission',
+        'update_all_permission',
+        'delete_all_permission',
     )
     
     def permissions_display(self, obj):
@@ -70,27 +164,76 @@ class AccessRoleRuleAdmin(admin.ModelAdmin):
         if obj.create_permission: perms.append("Create")
         if obj.update_permission: perms.append("Update")
         if obj.delete_permission: perms.append("Delete")
+        if obj.read_all_permission: perms.append("Read all")
+        if obj.update_all_permission: perms.append("Update all")
+        if obj.delete_all_permission: perms.append("Delete all")
         return ", ".join(perms) or "No permissions"
     permissions_display.short_description = 'Permissions Summary'
 
+    # Массовые действия: один upsert вместо UPDATE на каждую строку list_editable
+    actions = ('grant_all_permissions', 'revoke_all_permissions')
+    ALL = READ | CREATE | UPDATE | DELETE | READ_ALL | UPDATE_ALL | DELETE_ALL
+
+    def _apply(self, request, queryset, mode):
+        pairs = queryset.values_list('role_id', 'element_id')
+        saved, deleted = apply_matrix({pair: self.ALL for pair in pairs}, mode)
+        self.message_user(request, f"{saved} rule(s) updated, {deleted} removed")
+
+    def grant_all_permissions(self, request, queryset):
+        self._apply(request, queryset, GRANT)
+    grant_all_permissions.short_description = 'Grant all permissions'
+
+    def revoke_all_permissions(self, request, queryset):
+        self._apply(request, queryset, REVOKE)
+    revoke_all_permissions.short_description = 'Revoke all permissions (delete rules)'
+
 # Кастомизация отображения сессий
 class UserSessionAdmin(admin.ModelAdmin):
-    list_display = ('user', 'session_key_short', 'ip_address', 'created_at', 'expires_at', 'is_active_display')
-    list_filter = ('user', 'created_at')
-    readonly_fields = ('session_key', 'user_agent', 'created_at')
-    
-    def session_key_short(self, obj):
-        return f"{obj.session_key[:10]}..." if obj.session_key else ""
-    session_key_short.short_description = 'Session Key'
-    
+    list_display = ('user', 'key_id_short', 'ip_address', 'created_at', 'expires_at', 'is_active_display')
+    list_filter = (SessionActiveFilter, 'created_at')
+    list_select_related = ('user',)
+    # Точное совпадение попадает в индексы, в отличие от icontains
+    search_fields = ('=user__email', '=ip_address')
+    autocomplete_fields = ('user',)
+    readonly_fields = ('key_id', 'user_agent', 'created_at')
+    ordering = ('-pk',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            is_active_db=ExpressionWrapper(Q(expires_at__gt=Now()), output_field=BooleanField())
+        )
+
+    def key_id_short(self, obj):
+        return f"{obj.key_id[:10]}..." if obj.key_digest else ""
+    key_id_short.short_description = 'Key Digest'
+
     def is_active_display(self, obj):
-        return obj.is_active()
+        return obj.is_active_db
     is_active_display.boolean = True
     is_active_display.short_description = 'Is Active'
+    is_active_display.admin_order_field = 'is_active_db'
+
+# Журнал только для чтения: события пишет accounts.audit
+class AuthEventAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'user', 'email', 'ip_address', 'created_at')
+    list_filter = ('kind',)
+    list_select_related = ('user',)
+    search_fields = ('=user__email', '=email', '=ip_address')
+    ordering = ('-pk',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Role, RoleAdmin)
 admin.site.register(BusinessElement)
 admin.site.register(AccessRoleRule, AccessRoleRuleAdmin)
-admin.site.register(UserSession, UserSessionAdmin)
\ No newline at end of file
+admin.site.register(UserSession, UserSessionAdmin)
+admin.site.register(AuthEvent, AuthEventAdmin)
\ No newline at end of file
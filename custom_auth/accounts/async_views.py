@@ -0,0 +1,200 @@
+"""
+Асинхронные версии тяжёлых по CPU эндпоинтов для запуска через custom_auth/asgi.py.
+Хеширование паролей уходит в ограниченный пул (accounts.hashing),
+поэтому шторм логинов не блокирует остальные запросы воркера.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import render
+from django.utils.http import parse_etags
+
+from . import audit
+from .auth_decorators import require_auth
+from .http import RequestError, json_response, parse_body
+from .hashing import HashingPoolBusy, acheck_dummy_password, acheck_password, aset_password
+from .models import AuthEvent, User
+from .ratelimit import get_limiter, too_many_attempts
+from .schemas import LoginRequest, RegisterRequest, UpdateProfileRequest
+from .session_store import get_store
+from .snapshot import UserSnapshot
+from .tokens import issue_tokens
+from .utils import create_user, record_login
+
+
+def async_csrf_exempt(view_func):
+    """csrf_exempt из Django 4.2 оборачивает view в синхронную функцию"""
+    view_func.csrf_exempt = True
+    return view_func
+
+
+def _busy_response(exc):
+    response = json_response({'error': 'Server is busy, try again later'}, status=503)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+@async_csrf_exempt
+async def aregister_user(request):
+    if request.method == 'GET':
+        return render(request, 'accounts/register.html')
+
+    if request.method != 'POST':
+        return json_response({'error': 'Only GET and POST methods are allowed'}, status=405)
+
+    try:
+        data = parse_body(request, RegisterRequest)
+    except RequestError as e:
+        return e.response()
+    user = User(
+        email=data.email.strip(),
+        first_name=data.first_name,
+        last_name=data.last_name,
+        role_id=data.role_id,
+    )
+
+    try:
+        await aset_password(user, data.password)
+    except HashingPoolBusy as e:
+        return _busy_response(e)
+
+    error = await sync_to_async(create_user)(user)
+    if error:
+        return json_response({'error': error}, status=400)
+
+    return json_response({'message': 'User registered successfully'}, status=201)
+
+
+@async_csrf_exempt
+async def alogin_user(request):
+    if request.method == 'GET':
+        return render(request, 'accounts/login.html')
+
+    if request.method != 'POST':
+        return json_response({'error': 'Only GET and POST methods are allowed'}, status=405)
+
+    try:
+        data = parse_body(request, LoginRequest)
+    except RequestError as e:
+        return e.response()
+    email = data.email
+    password = data.password
+
+    # Отсекаем перебор до поиска пользователя и дорогой проверки пароля
+    limiter = get_limiter()
+    email_key = email.strip().lower()
+    retry_after = limiter.check(request.META.get('REMOTE_ADDR'), email_key)
+    if retry_after:
+        return too_many_attempts(retry_after)
+
+    try:
+        user = await User.objects.select_related('role').aget(email__lower=email_key)
+    except User.DoesNotExist:
+        # Та же стоимость, что у неверного пароля: время ответа не выдаёт существование email
+        try:
+            await acheck_dummy_password(password)
+        except HashingPoolBusy as e:
+            return _busy_response(e)
+        limiter.failure(email_key)
+        audit.record(AuthEvent.LOGIN_FAILED, request=request, email=email_key, block=False)
+        return json_response({'error': 'Invalid credentials'}, status=401)
+
+    try:
+        password_valid = await acheck_password(user, password)
+    except HashingPoolBusy as e:
+        return _busy_response(e)
+
+    if not password_valid:
+        limiter.failure(email_key)
+        audit.record(AuthEvent.LOGIN_FAILED, user, request, block=False)
+        return json_response({'error': 'Invalid credentials'}, status=401)
+    limiter.success(email_key)
+
+    if not user.is_active:
+        return json_response({'error': 'User is inactive'}, status=403)
+
+    jwt_mode = settings.AUTH_MODE == 'jwt'
+    session = await sync_to_async(record_login)(
+        user,
+        ip_address=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        create_session=not jwt_mode
+    )
+    audit.record(AuthEvent.LOGIN, user, request, block=False)
+
+    user_data = {
+        'id': user.id,
+        'email': user.email,
+        'role': user.role.name if user.role else None
+    }
+
+    if jwt_mode:
+        return json_response({
+            'message': 'Login successful',
+            **issue_tokens(user),
+            'user': user_data
+        })
+
+    return json_response({
+        'message': 'Login successful',
+        'session_key': session.session_key,
+        'user': user_data
+    })
+
+
+@async_csrf_exempt
+@require_auth
+async def aupdate_profile(request):
+    if request.method == 'GET':
+        return render(request, 'accounts/update_profile.html')
+    if request.method != 'POST':
+        return json_response({'error': 'Only POST allowed'}, status=405)
+
+    try:
+        data = parse_body(request, UpdateProfileRequest)
+    except RequestError as e:
+        return e.response()
+
+    if request.token_payload is not None:
+        # Ленивый снимок для токенов нельзя загрузить в async-контексте
+        user_id = request.token_payload['sub']
+    else:
+        user_id = request.user.id
+    # request.user — неизменяемый снимок, для записи загружаем модель
+    user = await User.objects.select_related('role').aget(pk=user_id)
+
+    if data.first_name is not None:
+        user.first_name = data.first_name
+    if 'last_name' in data.model_fields_set:
+        user.last_name = data.last_name
+
+    if data.password:
+        if data.password != data.password_repeat:
+            return json_response({'error': 'Passwords do not match'}, status=400)
+        try:
+            await aset_password(user, data.password)
+        except HashingPoolBusy as e:
+            return _busy_response(e)
+
+    await user.asave(update_fields=['first_name', 'last_name', 'password_hash'])
+    if request.session_obj is not None:
+        request.session_obj.snapshot = UserSnapshot.from_user(user)
+    await sync_to_async(get_store().refresh_user)(user, keep=request.session_obj)
+    audit.record(AuthEvent.PROFILE_UPDATE, user, request, block=False)
+    return json_response({'message': 'Profile updated successfully'})
+
+
+@require_auth
+async def ame(request):
+    """Профиль текущего пользователя без перехода в пул потоков при попадании в кеш"""
+    if request.method != 'GET':
+        return json_response({'error': 'Only GET allowed'}, status=405)
+
+    snapshot = await request.auser()
+    etag = snapshot.etag
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.body, content_type='application/json')
+    response['ETag'] = etag
+    return response
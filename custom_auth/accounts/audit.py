@@ -0,0 +1,230 @@
+"""
+Журнал событий аутентификации без записи в БД на горячем пути.
+
+View кладут события в ограниченный буфер процесса, фоновый поток пишет их
+одним bulk_create, когда накопилось BATCH_SIZE событий или прошло
+FLUSH_INTERVAL_MS миллисекунд. При переполнении буфера событие
+отбрасывается и учитывается в счётчике ('drop') или вызывающий поток ждёт,
+пока поток записи освободит место ('block'). Остаток пишется при выходе процесса.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import AuthEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL_MS': 1000,
+    'MAX_PENDING': 10000,
+    'OVERFLOW': 'drop',  # 'drop' — отбросить и посчитать, 'block' — ждать места в буфере
+}
+
+OVERFLOW_POLICIES = ('drop', 'block')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'AUDIT_LOG', {}))
+    return config
+
+
+class AuditBuffer:
+    """Ограниченная очередь событий и фоновый поток, который пишет её в БД"""
+
+    def __init__(self, batch_size, flush_interval, max_pending, overflow):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown AUDIT_LOG overflow policy: {overflow}')
+        if max_pending < batch_size:
+            raise ValueError('AUDIT_LOG MAX_PENDING must not be less than BATCH_SIZE')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.stats = {'recorded': 0, 'written': 0, 'dropped': 0, 'failed': 0}
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)  # Ждёт поток записи
+        self._space = threading.Condition(self._lock)  # Ждут view при 'block'
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._waiting = 0  # Потоки, ждущие места в буфере при 'block'
+
+    def record(self, event, block=True):
+        with self._lock:
+            while len(self._events) >= self.max_pending:
+                if self.overflow == 'drop' or not block or self._stopping:
+                    self.stats['dropped'] += 1
+                    return False
+                self._start()
+                self._waiting += 1
+                self._ready.notify()
+                try:
+                    self._space.wait()
+                finally:
+                    self._waiting -= 1
+            self._events.append(event)
+            self.stats['recorded'] += 1
+            if self._thread is None:
+                self._start()
+            elif len(self._events) >= self.batch_size:
+                self._ready.notify()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+    def _start(self):
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name='auth-audit-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._events) < self.batch_size and not self._waiting and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._ready.wait(remaining)
+                stopping = self._stopping
+            self.flush()
+            close_old_connections()
+            if stopping:
+                return
+
+    def flush(self):
+        """Запись всех накопленных событий; возвращает число записанных"""
+        with self._flush_lock:
+            with self._lock:
+                events = list(self._events)
+                self._events.clear()
+                self._space.notify_all()
+            if not events:
+                return 0
+            try:
+                AuthEvent.objects.bulk_create(events, batch_size=self.batch_size)
+            except DatabaseError:
+                # Журнал не должен ронять процесс: пачка теряется, но учитывается
+                logger.exception('Failed to write %d audit events', len(events))
+                self.stats['failed'] += len(events)
+                return 0
+            self.stats['written'] += len(events)
+            return len(events)
+
+    def stop(self, timeout=5):
+        """Остановка потока записи; он успевает записать остаток"""
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+            self._ready.notify()
+            self._space.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+
+_buffer = None
+_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _lock:
+            if _buffer is None:
+                config = get_config()
+                _buffer = AuditBuffer(
+                    config['BATCH_SIZE'], config['FLUSH_INTERVAL_MS'] / 1000,
+                    config['MAX_PENDING'], config['OVERFLOW'],
+                )
+    return _buffer
+
+
+def record(kind, user=None, request=None, email='', user_id=None, block=True):
+    """
+    Событие в журнал. Не обращается к БД; с OVERFLOW='block' может ждать
+    места в буфере. Возвращает False, если событие отброшено.
+    user_id и email вместо user — когда снимок пользователя не загружен (JWT).
+    block=False — для async view: событийный цикл не ждёт, событие отбрасывается.
+    """
+    if not get_config()['ENABLED']:
+        return False
+    event = AuthEvent(
+        user_id=user_id if user is None else user.id,
+        kind=kind,
+        email=email or getattr(user, 'email', ''),
+        created_at=timezone.now(),
+    )
+    if request is not None:
+        event.ip_address = request.META.get('REMOTE_ADDR')
+        event.user_agent = request.META.get('HTTP_USER_AGENT', '')
+    return get_buffer().record(event, block)
+
+
+def flush():
+    if _buffer is not None:
+        return _buffer.flush()
+    return 0
+
+
+def get_stats():
+    """Счётчики для мониторинга"""
+    if _buffer is None:
+        return {}
+    return dict(_buffer.stats)
+
+
+def reset():
+    """
+    Сброс буфера (например, после изменения настроек в тестах).
+    Поток записи останавливается, незаписанные события отбрасываются:
+    при необходимости вызовите flush() до этого.
+    """
+    global _buffer
+    with _lock:
+        buffer, _buffer = _buffer, None
+    if buffer is not None:
+        with buffer._lock:
+            buffer._events.clear()
+        buffer.stop()
+
+
+def shutdown():
+    """Запись остатка при выходе; после reset() буфера нет и писать нечего"""
+    buffer = _buffer
+    if buffer is not None:
+        buffer.stop()
+        buffer.flush()
+
+
+atexit.register(shutdown)
+
+
+def query_events(user=None, kinds=None, since=None, until=None, limit=100):
+    """
+    Записанные события, новые первыми. С user запрос идёт по индексу
+    (user, created_at), без него — по created_at. Ещё не записанные
+    события буфера в выборку не попадают.
+    """
+    queryset = AuthEvent.objects.all()
+    if user is not None:
+        queryset = queryset.filter(user_id=getattr(user, 'id', user))
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset.order_by('-created_at', '-id')[:limit]
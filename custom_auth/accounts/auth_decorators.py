@@ -1,25 +1,189 @@
+import asyncio
 from functools import wraps
-from django.http import JsonResponse
-from .models import UserSession
-from django.utils import timezone
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .http import json_response
+from .instrumentation import phase
+from .permissions import ACTIONS, ahas_permission, has_permission
+from .session_store import get_store
+from .snapshot import UserSnapshot
+from .tokens import TokenError, adecode_token, decode_token
 
-def require_auth(view_func):
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
+
+def _token_user(payload):
+    """Снимок пользователя загружается, только если он действительно нужен view"""
+    def load():
+        with phase('user_load'):
+            return UserSnapshot.load(payload['sub'])
+
+    return SimpleLazyObject(load)
+
+
+def _auser(request, payload):
+    """
+    request.auser() для async view. Снимок сессии уже загружен; снимок по токену
+    нельзя вычислить в событийном цикле через ленивый request.user,
+    поэтому он загружается через async ORM.
+    """
+    async def auser():
+        if request.session_snapshot is None:
+            with phase('user_load'):
+                request.session_snapshot = await UserSnapshot.aload(payload['sub'])
+            request.user = request.session_snapshot
+        return request.session_snapshot
+
+    return auser
+
+
+def _parse_header(request):
+    """(схема, значение) заголовка Authorization; схема None, если заголовка нет"""
+    with phase('header_parse'):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
-        if not auth_header or not auth_header.startswith('Session '):
-            return JsonResponse({'error': 'Authentication required'}, status=401)
+        scheme, _, credentials = (auth_header or '').partition(' ')
+    if not auth_header:
+        return None, None
+    return scheme, credentials
+
+
+def _set_session(request, session):
+    """Проверяет найденную сессию и заполняет request; возвращает ответ с ошибкой или None"""
+    if session is None:
+        return json_response({'error': 'Invalid session'}, status=401)
+    if not session.is_active():
+        return json_response({'error': 'Session expired'}, status=401)
+
+    request.user = request.session_snapshot = session.snapshot
+    request.session_obj = session  # если пригодится
+    request.token_payload = None
+    return None
+
+
+def _set_token(request, payload):
+    request.user = _token_user(payload)
+    request.session_snapshot = None
+    request.session_obj = None
+    request.token_payload = payload
+
+
+def _authenticate(request):
+    """Заполняет request.user/session_obj/token_payload или возвращает ответ с ошибкой"""
+    scheme, credentials = _parse_header(request)
+    if scheme is None:
+        return json_response({'error': 'Authentication required'}, status=401)
+
+    if scheme in settings.JWT_CONFIG['AUTH_HEADER_TYPES']:
+        try:
+            with phase('session_lookup'):
+                payload = decode_token(credentials)
+        except TokenError as e:
+            return json_response({'error': str(e)}, status=401)
+        _set_token(request, payload)
+        return None
+
+    if scheme != 'Session':
+        return json_response({'error': 'Authentication required'}, status=401)
 
-        session_key = auth_header.split(' ')[1]
+    store = get_store()
+    with phase('session_lookup'):
+        session = store.get(credentials)
+    error = _set_session(request, session)
+    if error is None:
+        store.touch(session)
+    return error
+
+
+async def _aauthenticate(request):
+    """
+    То же, что _authenticate, но кеш и БД опрашиваются через async API:
+    при попадании в кеш запрос не уходит в пул потоков.
+    Пользователь по токену доступен через await request.auser().
+    """
+    scheme, credentials = _parse_header(request)
+    if scheme is None:
+        return json_response({'error': 'Authentication required'}, status=401)
+
+    if scheme in settings.JWT_CONFIG['AUTH_HEADER_TYPES']:
         try:
-            session = UserSession.objects.get(session_key=session_key)
-            if not session.is_active():
-                return JsonResponse({'error': 'Session expired'}, status=401)
-        except UserSession.DoesNotExist:
-            return JsonResponse({'error': 'Invalid session'}, status=401)
+            with phase('session_lookup'):
+                payload = await adecode_token(credentials)
+        except TokenError as e:
+            return json_response({'error': str(e)}, status=401)
+        _set_token(request, payload)
+        request.auser = _auser(request, payload)
+        return None
+
+    if scheme != 'Session':
+        return json_response({'error': 'Authentication required'}, status=401)
+
+    store = get_store()
+    with phase('session_lookup'):
+        session = await store.aget(credentials)
+    error = _set_session(request, session)
+    if error is None:
+        request.auser = _auser(request, None)
+        await store.atouch(session)
+    return error
 
-        request.user = session.user
-        request.session_obj = session  # если пригодится
-        return view_func(request, *args, **kwargs)
+
+def require_auth(view_func):
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            error = await _aauthenticate(request)
+            if error is not None:
+                return error
+            with phase('view'):
+                return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        error = _authenticate(request)
+        if error is not None:
+            return error
+        with phase('view'):
+            return view_func(request, *args, **kwargs)
 
     return wrapper
+
+
+def require_permission(element_name, action):
+    """
+    Проверка прав роли по скомпилированной матрице.
+    Применяется поверх require_auth:
+
+        @require_auth
+        @require_permission('post', 'update')
+        def view(request): ...
+
+    Для async view проверка тоже асинхронная.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown action: {action}')
+
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                auser = getattr(request, 'auser', None)
+                user = await auser() if auser is not None else getattr(request, 'user', None)
+                with phase('permission_check'):
+                    allowed = await ahas_permission(user, element_name, action)
+                if not allowed:
+                    return json_response({'error': 'Permission denied'}, status=403)
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            with phase('permission_check'):
+                allowed = has_permission(getattr(request, 'user', None), element_name, action)
+            if not allowed:
+                return json_response({'error': 'Permission denied'}, status=403)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
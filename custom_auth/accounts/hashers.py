@@ -0,0 +1,71 @@
+"""
+Хешеры паролей с параметрами стоимости из настроек.
+Значения подбираются под железо командой `manage.py calibrate_hasher`.
+"""
+import secrets
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, ScryptPasswordHasher, check_password, get_hasher, identify_hasher,
+    make_password,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 с числом итераций из PASSWORD_HASH_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    Scrypt: требует много памяти, поэтому подбор на GPU дорог,
+    а проверка на сервере при этом дешевле PBKDF2 сопоставимой стойкости.
+    """
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', None) or ScryptPasswordHasher.work_factor
+
+    @property
+    def maxmem(self):
+        # Лимит OpenSSL по умолчанию (32 МБ) меньше, чем нужно при больших N
+        return 256 * self.block_size * self.work_factor
+
+
+def needs_rehash(encoded):
+    """Хеш записан другим алгоритмом или с другими параметрами стоимости"""
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher('default')
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+_dummy_hashes = {}
+
+
+def dummy_password_hash():
+    """
+    Хеш случайного пароля с текущими параметрами хешера по умолчанию.
+    Считается один раз на процесс (и заново при смене параметров), а не на каждый запрос.
+    """
+    hasher = get_hasher('default')
+    key = (hasher.algorithm, getattr(hasher, 'iterations', None), getattr(hasher, 'work_factor', None))
+    encoded = _dummy_hashes.get(key)
+    if encoded is None:
+        encoded = _dummy_hashes[key] = make_password(secrets.token_urlsafe(16))
+    return encoded
+
+
+def check_dummy_password(raw_password):
+    """
+    Проверка пароля для несуществующего пользователя. Стоит столько же,
+    сколько проверка настоящего хеша, поэтому по времени ответа нельзя понять,
+    зарегистрирован ли email. Всегда возвращает False.
+    """
+    check_password(raw_password, dummy_password_hash())
+    return False
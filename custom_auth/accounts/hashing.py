@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from .hashers import check_dummy_password, needs_rehash
+from .instrumentation import phase
+
+DEFAULTS = {
+    'KIND': 'thread',  # 'thread' или 'process'
+    'WORKERS': 4,
+    'MAX_PENDING': 64,  # Максимум задач в работе и в очереди
+    'RETRY_AFTER': 1,  # Значение заголовка Retry-After при перегрузке, в секундах
+}
+
+
+class HashingPoolBusy(Exception):
+    """Очередь хеширования заполнена, запрос нужно отклонить"""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing pool is busy')
+        self.retry_after = retry_after
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PASSWORD_HASHING_POOL', {}))
+    return config
+
+
+class HashingPool:
+    """
+    Ограниченный пул для PBKDF2 и других дорогих хешеров.
+    Когда задач больше MAX_PENDING, новые не ставятся в очередь,
+    а сразу отклоняются — дешёвые эндпоинты остаются отзывчивыми.
+    """
+
+    def __init__(self, kind, workers, max_pending, retry_after):
+        executor_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+        self.executor = executor_class(max_workers=workers)
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HashingPoolBusy(self.retry_after)
+            self.pending += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = get_config()
+                _pool = HashingPool(
+                    config['KIND'], config['WORKERS'],
+                    config['MAX_PENDING'], config['RETRY_AFTER'],
+                )
+    return _pool
+
+
+async def acheck_password(user, raw_password):
+    """Асинхронный аналог User.check_password, включая перехеширование"""
+    with phase('hashing'):
+        valid = await get_pool().run(check_password, raw_password, user.password_hash)
+    if valid and needs_rehash(user.password_hash):
+        try:
+            await aset_password(user, raw_password)
+        except HashingPoolBusy:
+            return valid  # Перехешируем при следующем входе
+        await type(user).objects.filter(pk=user.pk).aupdate(password_hash=user.password_hash)
+    return valid
+
+
+async def acheck_dummy_password(raw_password):
+    """Асинхронный аналог check_dummy_password"""
+    with phase('hashing'):
+        return await get_pool().run(check_dummy_password, raw_password)
+
+
+async def aset_password(user, raw_password):
+    """Асинхронный аналог User.set_password"""
+    with phase('hashing'):
+        user.password_hash = await get_pool().run(make_password, raw_password)
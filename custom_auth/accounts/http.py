@@ -0,0 +1,124 @@
+"""
+Общий разбор тел запросов и сериализация JSON-ответов для view accounts.
+
+parse_body проверяет размер тела до чтения, декодирует байты без
+промежуточной строки и проверяет данные по pydantic-схеме из accounts.schemas.
+json_response сериализует через orjson, если он установлен и включён.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from pydantic import ValidationError
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость
+    orjson = None
+
+DEFAULTS = {
+    'MAX_BODY_SIZE': 64 * 1024,  # Тела больше отклоняются с 413 ещё до чтения
+    'FAST_ENCODER': True,  # orjson вместо стандартного json, если установлен
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'JSON_API', {}))
+    return config
+
+
+def _use_orjson():
+    return orjson is not None and get_config()['FAST_ENCODER']
+
+
+_encoder = DjangoJSONEncoder()
+
+
+def dumps(data):
+    """Сериализация в байты; типы, неизвестные orjson, — через DjangoJSONEncoder"""
+    if _use_orjson():
+        # Даты — через DjangoJSONEncoder, чтобы формат не зависел от кодировщика
+        return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def loads(body):
+    if _use_orjson():
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+class RequestError(Exception):
+    """Ошибка разбора запроса, которую view отдаёт клиенту как есть"""
+
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def response(self):
+        payload = {'error': self.message}
+        if self.details:
+            payload['details'] = self.details
+        return json_response(payload, status=self.status)
+
+
+def _read(request):
+    max_size = get_config()['MAX_BODY_SIZE']
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length > max_size:
+        raise RequestError('Request body too large', status=413)
+
+    if request.content_type != 'application/json':
+        return request.POST.dict()
+    body = request.body
+    if len(body) > max_size:
+        raise RequestError('Request body too large', status=413)
+    try:
+        data = loads(body)
+    except ValueError:
+        raise RequestError('Invalid JSON')
+    if not isinstance(data, dict):
+        raise RequestError('Invalid JSON')
+    return data
+
+
+def _details(errors):
+    return [
+        {'field': '.'.join(str(part) for part in error['loc']), 'message': error['msg']}
+        for error in errors
+    ]
+
+
+def parse_body(request, schema):
+    """
+    Тело запроса (JSON или форма), проверенное схемой.
+    Ошибки приходят как RequestError с текстом из schema.error_message
+    или schema.field_errors для первого неверного поля.
+    """
+    return _validate(_read(request), schema)
+
+
+def parse_query(request, schema):
+    """Параметры строки запроса, проверенные схемой (ошибки — как у parse_body)"""
+    return _validate(request.GET.dict(), schema)
+
+
+def _validate(data, schema):
+    try:
+        return schema.model_validate(data)
+    except ValidationError as exc:
+        errors = exc.errors(include_url=False, include_input=False)
+        field = errors[0]['loc'][0] if errors and errors[0]['loc'] else None
+        message = schema.field_errors.get(field, schema.error_message)
+        raise RequestError(message, details=_details(errors))
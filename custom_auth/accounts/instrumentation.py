@@ -0,0 +1,236 @@
+"""
+Инструментирование аутентификации: время по фазам запроса, число и длительность
+SQL-запросов, агрегирование в гистограммы и выдача в формате Prometheus.
+
+Пока AUTH_METRICS['ENABLED'] выключен, таймер запроса не создаётся,
+и каждая точка замера сводится к одному ContextVar.get().
+"""
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_current = contextvars.ContextVar('auth_request_timer', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'AUTH_METRICS', {}).get('ENABLED', False)
+
+
+class RequestTimer:
+    """Замеры одного запроса"""
+
+    __slots__ = ('phases', 'queries', 'query_time')
+
+    def __init__(self):
+        self.phases = {}
+        self.queries = 0
+        self.query_time = 0.0
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoopPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP = _NoopPhase()
+
+
+def phase(name):
+    """
+    Контекстный менеджер замера фазы:
+
+        with phase('session_lookup'):
+            session = get_session(key)
+    """
+    timer = _current.get()
+    if timer is None:
+        return _NOOP
+    return _Phase(timer, name)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}  # (view, phase) -> Histogram
+        self.queries = {}  # view -> [число запросов, суммарное время]
+        self.requests = {}  # (view, status) -> число
+
+    def record(self, view, status, timer):
+        with self._lock:
+            for name, seconds in timer.phases.items():
+                histogram = self.phases.get((view, name))
+                if histogram is None:
+                    histogram = self.phases[(view, name)] = Histogram()
+                histogram.observe(seconds)
+            totals = self.queries.setdefault(view, [0, 0.0])
+            totals[0] += timer.queries
+            totals[1] += timer.query_time
+            self.requests[(view, status)] = self.requests.get((view, status), 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self.phases.clear()
+            self.queries.clear()
+            self.requests.clear()
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus"""
+        from .audit import get_stats as get_audit_stats
+        from .ratelimit import get_stats
+
+        lines = [
+            '# HELP auth_phase_seconds Time spent in each phase of a request',
+            '# TYPE auth_phase_seconds histogram',
+        ]
+        with self._lock:
+            for (view, name), histogram in sorted(self.phases.items()):
+                labels = f'view="{view}",phase="{name}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'auth_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'auth_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'auth_phase_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'auth_phase_seconds_count{{{labels}}} {histogram.count}')
+
+            lines.append('# HELP auth_requests_total Requests by view and status')
+            lines.append('# TYPE auth_requests_total counter')
+            for (view, status), count in sorted(self.requests.items()):
+                lines.append(f'auth_requests_total{{view="{view}",status="{status}"}} {count}')
+
+            lines.append('# HELP auth_db_queries_total SQL queries executed by view')
+            lines.append('# TYPE auth_db_queries_total counter')
+            for view, (count, _) in sorted(self.queries.items()):
+                lines.append(f'auth_db_queries_total{{view="{view}"}} {count}')
+            lines.append('# HELP auth_db_query_seconds_total Time spent in SQL queries by view')
+            lines.append('# TYPE auth_db_query_seconds_total counter')
+            for view, (_, seconds) in sorted(self.queries.items()):
+                lines.append(f'auth_db_query_seconds_total{{view="{view}"}} {seconds}')
+
+        lines.append('# HELP auth_login_ratelimit_total Login rate limiter decisions')
+        lines.append('# TYPE auth_login_ratelimit_total counter')
+        for name, count in sorted(get_stats().items()):
+            lines.append(f'auth_login_ratelimit_total{{result="{name}"}} {count}')
+
+        lines.append('# HELP auth_audit_events_total Audit log events by outcome')
+        lines.append('# TYPE auth_audit_events_total counter')
+        for name, count in sorted(get_audit_stats().items()):
+            lines.append(f'auth_audit_events_total{{result="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrappers: считает запросы текущего запроса"""
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.query_time += time.perf_counter() - start
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created"""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+def _finish(request, response, timer, start):
+    total = time.perf_counter() - start
+    if 'view' not in timer.phases:
+        # View без require_auth: всё, что не попало в другие фазы
+        timer.phases['view'] = max(0.0, total - sum(timer.phases.values()))
+    timer.phases['total'] = total
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unmatched'
+    registry.record(view, response.status_code, timer)
+
+
+class AuthMetricsMiddleware:
+    """Создаёт таймер на запрос и сохраняет замеры после ответа"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not is_enabled():
+            return self.get_response(request)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, timer, start)
+        return response
+
+    async def __acall__(self, request):
+        if not is_enabled():
+            return await self.get_response(request)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, timer, start)
+        return response
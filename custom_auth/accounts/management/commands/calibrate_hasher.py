@@ -0,0 +1,58 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from accounts.hashers import TunedPBKDF2PasswordHasher, TunedScryptPasswordHasher
+
+
+class Command(BaseCommand):
+    help = 'Подбирает стоимость хеширования паролей под целевое время на этом сервере'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250, help='Желаемое время одного хеша')
+        parser.add_argument('--algorithm', choices=('pbkdf2', 'scrypt'), default='pbkdf2')
+        parser.add_argument('--samples', type=int, default=5)
+
+    def handle(self, *args, **options):
+        target = options['target_ms'] / 1000
+        if options['algorithm'] == 'pbkdf2':
+            setting, value, elapsed = self.calibrate_pbkdf2(target, options['samples'])
+        else:
+            setting, value, elapsed = self.calibrate_scrypt(target, options['samples'])
+
+        self.stdout.write(f'Measured {elapsed * 1000:.1f} ms per hash (target {target * 1000:.0f} ms)')
+        self.stdout.write(self.style.SUCCESS(f'{setting} = {value}'))
+
+    def measure(self, hash_once, samples):
+        hash_once()  # Прогрев
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hash_once()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def calibrate_pbkdf2(self, target, samples):
+        hasher = TunedPBKDF2PasswordHasher()
+        salt = hasher.salt()
+        probe = 100_000
+        elapsed = self.measure(lambda: hasher.encode('calibration', salt, probe), samples)
+        # Время PBKDF2 линейно по числу итераций
+        iterations = max(100_000, int(probe * target / elapsed) // 1000 * 1000)
+        elapsed = self.measure(lambda: hasher.encode('calibration', salt, iterations), samples)
+        return 'PASSWORD_HASH_ITERATIONS', iterations, elapsed
+
+    def calibrate_scrypt(self, target, samples):
+        hasher = TunedScryptPasswordHasher()
+        salt = hasher.salt()
+        work_factor = 2 ** 14
+        # N — степень двойки: удваиваем, пока следующий шаг не превысит цель
+        while True:
+            with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=work_factor):
+                elapsed = self.measure(lambda: hasher.encode('calibration', salt), samples)
+            if elapsed * 2 > target or work_factor >= 2 ** 20:
+                break
+            work_factor *= 2
+        return 'PASSWORD_SCRYPT_WORK_FACTOR', f'2 ** {work_factor.bit_length() - 1}', elapsed
@@ -0,0 +1,51 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+
+FIELDS = ('email', 'first_name', 'last_name', 'role', 'is_active', 'password_hash')
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка пользователей в CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Путь к файлу или '-' для stdout")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='По умолчанию по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+
+        # values_list + iterator: строки не кешируются, память не растёт с размером таблицы
+        rows = User.objects.order_by('pk').values_list(
+            'email', 'first_name', 'last_name', 'role__name', 'is_active', 'password_hash'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        count = 0
+        started = time.monotonic()
+        try:
+            if fmt == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(FIELDS)
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for row in rows:
+                    stream.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n')
+                    count += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {count} users in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+
+from accounts.models import Role, User
+
+
+def read_rows(stream, fmt):
+    """Построчное чтение CSV или JSONL без загрузки файла в память"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт пользователей из CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу или '-' для stdin")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='По умолчанию по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов для хеширования паролей (по умолчанию по числу CPU)',
+        )
+        parser.add_argument(
+            '--pre-hashed', action='store_true',
+            help='Пароли уже захешированы (колонка password_hash), например из export_users',
+        )
+        parser.add_argument('--default-role', help='Роль для строк без колонки role')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        chunk_size = options['chunk_size']
+        pre_hashed = options['pre_hashed']
+
+        roles = dict(Role.objects.values_list('name', 'id'))
+        default_role = options['default_role']
+        if default_role and default_role not in roles:
+            raise CommandError(f'Unknown role: {default_role}')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        workers = options['workers'] or os.cpu_count() or 1
+        pool = None if pre_hashed else ProcessPoolExecutor(max_workers=workers)
+        hash_chunk = max(1, chunk_size // (workers * 4))
+        created = skipped = invalid = 0
+        started = time.monotonic()
+        try:
+            for rows in chunked(read_rows(stream, fmt), chunk_size):
+                users, passwords, bad = self.build_users(rows, roles, default_role, pre_hashed)
+                invalid += bad
+                # Одна выборка на порцию вместо exists() на каждую строку
+                # email__lower попадает в уникальный индекс по LOWER(email)
+                existing = {email.lower() for email in User.objects.filter(
+                    email__lower__in=[user.email.lower() for user in users]
+                ).values_list('email', flat=True)}
+                if existing:
+                    pairs = [(u, p) for u, p in zip(users, passwords) if u.email.lower() not in existing]
+                    users = [u for u, _ in pairs]
+                    passwords = [p for _, p in pairs]
+                    skipped += len(existing)
+
+                # Хешируем только то, что действительно будет вставлено
+                if pool is not None:
+                    passwords = pool.map(make_password, passwords, chunksize=hash_chunk)
+                for user, password_hash in zip(users, passwords):
+                    user.password_hash = password_hash
+                User.objects.bulk_create(users, batch_size=chunk_size)
+                created += len(users)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{created} created, {skipped} existing, {invalid} invalid '
+                    f'({created / elapsed if elapsed else 0:.0f} rows/s)'
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} users in {time.monotonic() - started:.2f}s'
+        ))
+
+    def build_users(self, rows, roles, default_role, pre_hashed):
+        users = []
+        passwords = []
+        seen = set()
+        invalid = 0
+        for row in rows:
+            email = (row.get('email') or '').strip()
+            password = row.get('password_hash' if pre_hashed else 'password')
+            role_name = row.get('role') or default_role
+            try:
+                validate_email(email)
+            except ValidationError:
+                invalid += 1
+                continue
+            if email.lower() in seen or not password or not row.get('first_name') or (
+                role_name and role_name not in roles
+            ):
+                invalid += 1
+                continue
+            seen.add(email.lower())
+            is_active = row.get('is_active', True)
+            if isinstance(is_active, str):
+                is_active = is_active.strip().lower() not in ('0', 'false', 'no', '')
+            users.append(User(
+                email=email,
+                first_name=row['first_name'],
+                last_name=row.get('last_name') or '',
+                role_id=roles[role_name] if role_name else None,
+                is_active=is_active,
+            ))
+            passwords.append(password)
+        return users, passwords, invalid
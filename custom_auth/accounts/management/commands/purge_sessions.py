@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from accounts.models import UserSession
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие сессии порциями по диапазонам первичного ключа'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Размер диапазона id, удаляемого одним запросом',
+        )
+        parser.add_argument(
+            '--older-than', type=float, default=0,
+            help='Удалять только сессии, истёкшие больше указанного числа часов назад',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько сессий будет удалено',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между порциями в секундах, чтобы не мешать рабочей нагрузке',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, повторяя очистку каждые --interval секунд',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Интервал между проходами в режиме --loop',
+        )
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            # Фоновый режим: пониженный приоритет процесса
+            if hasattr(os, 'nice'):
+                os.nice(10)
+            while True:
+                self.purge(options)
+                time.sleep(options['interval'])
+        else:
+            self.purge(options)
+
+    def purge(self, options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=options['older_than'])
+
+        expired = UserSession.objects.filter(expires_at__lt=cutoff)
+        bounds = expired.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No expired sessions')
+            return 0
+
+        total = 0
+        started = time.monotonic()
+        for low in range(bounds['low'], bounds['high'] + 1, chunk_size):
+            chunk = expired.filter(pk__gte=low, pk__lt=low + chunk_size)
+            if dry_run:
+                total += chunk.count()
+            else:
+                deleted, _ = chunk.delete()
+                total += deleted
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else 0
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {total} sessions in {elapsed:.2f}s ({rate:.0f} rows/s)'
+        ))
+        return total
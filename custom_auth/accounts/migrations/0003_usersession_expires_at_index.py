@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_usersession_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usersession',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usersession_expires_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['user', 'expires_at'], name='usersession_user_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_usersession_user_expires_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('login', 'Login'), ('login_failed', 'Failed login'), ('logout', 'Logout'), ('profile_update', 'Profile update'), ('deactivate', 'Deactivation')], max_length=20)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('ip_address', models.GenericIPAddressField(null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='auth_events', to='accounts.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='authevent_user_created_idx'), models.Index(fields=['created_at'], name='authevent_created_idx')],
+            },
+        ),
+    ]
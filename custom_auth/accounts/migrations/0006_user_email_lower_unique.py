@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_authevent'),
+    ]
+
+    operations = [
+        # Сначала новый индекс, затем снятие старого: уникальность не пропадает
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_lower_uniq'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=254),
+        ),
+    ]
@@ -0,0 +1,59 @@
+import hashlib
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+
+
+def fill_key_digest(apps, schema_editor):
+    """
+    Хеши ключей существующих сессий пачками по BATCH_SIZE строк.
+    Каждая пачка — своя транзакция: таблица не блокируется целиком,
+    а прерванную миграцию можно перезапустить с места остановки.
+    """
+    UserSession = apps.get_model('accounts', 'UserSession')
+    pending = UserSession.objects.filter(key_digest__isnull=True).order_by('pk')
+    last_pk = 0
+    while True:
+        rows = list(pending.filter(pk__gt=last_pk).only('pk', 'session_key')[:BATCH_SIZE])
+        if not rows:
+            break
+        for row in rows:
+            row.key_digest = hashlib.sha256(row.session_key.encode()).digest()
+        with transaction.atomic():
+            UserSession.objects.bulk_update(rows, ['key_digest'])
+        last_pk = rows[-1].pk
+
+
+def drop_sessions(apps, schema_editor):
+    # Ключи по хешам не восстановить: сессии удаляются, пользователи входят заново
+    apps.get_model('accounts', 'UserSession').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0006_user_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='key_digest',
+            field=models.BinaryField(max_length=32, null=True),
+        ),
+        migrations.RunPython(fill_key_digest, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usersession',
+            name='key_digest',
+            field=models.BinaryField(max_length=32, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='usersession',
+            name='session_key',
+        ),
+        # При откате сессии удаляются до возврата столбца session_key
+        migrations.RunPython(migrations.RunPython.noop, drop_sessions),
+    ]
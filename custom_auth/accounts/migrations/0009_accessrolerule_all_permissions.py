@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_role_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessrolerule',
+            name='delete_all_permission',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='accessrolerule',
+            name='read_all_permission',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='accessrolerule',
+            name='update_all_permission',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,41 +1,78 @@
 # models.py
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
 
+from .instrumentation import phase
+from .utils import session_digest
+
 class Role(models.Model):
     """
     Модель ролей пользователей (админ, модератор, пользователь и т.д.)
     """
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
+    # Роль наследует все права родителя (и его предков)
+    parent = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children'
+    )
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        """Роль не может оказаться собственным предком"""
+        parent_id = self.parent_id
+        seen = set()
+        while parent_id is not None and parent_id not in seen:
+            if parent_id == self.pk:
+                raise ValidationError({'parent': 'Role hierarchy must not contain cycles'})
+            seen.add(parent_id)
+            parent_id = Role.objects.filter(pk=parent_id).values_list('parent_id', flat=True).first()
+
 class User(models.Model):
     """
     Кастомная модель пользователя с дополнительными полями
     """
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50, blank=True, null=True)
-    email = models.EmailField(unique=True)
+    # Уникальность без учёта регистра — функциональным индексом в Meta
+    email = models.EmailField()
     password_hash = models.CharField(max_length=128)
     role = models.ForeignKey(Role, on_delete=models.SET_NULL, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_login = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # Один аккаунт на адрес: A@x.com и a@x.com совпадают.
+            # Индекс по LOWER(email) обслуживает и вход (email__lower=...)
+            models.UniqueConstraint(Lower('email'), name='user_email_lower_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.email} ({self.role})"
 
     def set_password(self, raw_password):
         """Хеширование пароля перед сохранением"""
-        self.password_hash = make_password(raw_password)
+        with phase('hashing'):
+            self.password_hash = make_password(raw_password)
 
     def check_password(self, raw_password):
-        """Проверка пароля"""
-        return check_password(raw_password, self.password_hash)
+        """Проверка пароля с перехешированием, если изменилась политика хеширования"""
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # Пишем только один столбец, остальные поля строки не трогаем
+            User.objects.filter(pk=self.pk).update(password_hash=self.password_hash)
+
+        with phase('hashing'):
+            return check_password(raw_password, self.password_hash, setter)
+
+# email__lower=... даёт LOWER(email) = ..., то есть попадает в индекс user_email_lower_uniq
+User._meta.get_field('email').register_lookup(Lower)
 
 class BusinessElement(models.Model):
     """
@@ -55,11 +92,15 @@ class AccessRoleRule(models.Model):
     role = models.ForeignKey(Role, on_delete=models.CASCADE, related_name="access_rules")
     element = models.ForeignKey(BusinessElement, on_delete=models.CASCADE)
 
-    # Права доступа
+    # Права доступа; read/update/delete — только к своим объектам
     read_permission = models.BooleanField(default=False)
     create_permission = models.BooleanField(default=False)
     update_permission = models.BooleanField(default=False)
     delete_permission = models.BooleanField(default=False)
+    # Те же права ко всем объектам элемента (включают права к своим)
+    read_all_permission = models.BooleanField(default=False)
+    update_all_permission = models.BooleanField(default=False)
+    delete_all_permission = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ('role', 'element')  # Одна роль - один набор прав на элемент
@@ -72,15 +113,80 @@ class UserSession(models.Model):
     Модель для хранения активных сессий пользователей
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    session_key = models.CharField(max_length=40, unique=True)
+    # SHA-256 ключа сессии: сам ключ в БД не хранится и отдаётся только клиенту
+    key_digest = models.BinaryField(max_length=32, unique=True)
     ip_address = models.GenericIPAddressField(null=True)
     user_agent = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            # Активные сессии пользователя: WHERE user_id = ? AND expires_at > ?
+            models.Index(fields=['user', 'expires_at'], name='usersession_user_expires_idx'),
+        ]
+
+    @property
+    def session_key(self):
+        """Ключ сессии; известен только у сессии, созданной в этом процессе"""
+        return self.__dict__.get('_session_key')
+
+    @session_key.setter
+    def session_key(self, value):
+        self._session_key = value
+        self.key_digest = session_digest(value)
+
+    @property
+    def key_id(self):
+        """Хеш ключа строкой: ключ кешей и идентификатор сессии для API"""
+        return bytes(self.key_digest).hex()
 
     def is_active(self):
         """Проверка активности сессии"""
         return self.expires_at > timezone.now()
 
+    def __getstate__(self):
+        # Копии и кеши, как и БД, получают только хеш ключа
+        state = super().__getstate__()
+        state.pop('_session_key', None)
+        return state
+
+    def __str__(self):
+        return f"Session for {self.user.email}"
+
+
+class AuthEvent(models.Model):
+    """
+    Журнал событий аутентификации (только добавление).
+    Пишется пачками из accounts.audit, а не отдельной вставкой на каждый запрос.
+    """
+    LOGIN = 'login'
+    LOGIN_FAILED = 'login_failed'
+    LOGOUT = 'logout'
+    PROFILE_UPDATE = 'profile_update'
+    DEACTIVATE = 'deactivate'
+    KINDS = [
+        (LOGIN, 'Login'),
+        (LOGIN_FAILED, 'Failed login'),
+        (LOGOUT, 'Logout'),
+        (PROFILE_UPDATE, 'Profile update'),
+        (DEACTIVATE, 'Deactivation'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='auth_events')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    email = models.CharField(max_length=254, blank=True)  # Для неудачных входов с неизвестным email
+    ip_address = models.GenericIPAddressField(null=True)
+    user_agent = models.TextField(blank=True)
+    # Время события, а не записи в БД: пачка пишется позже
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # История пользователя: WHERE user_id = ? AND created_at ... ORDER BY created_at DESC
+            models.Index(fields=['user', 'created_at'], name='authevent_user_created_idx'),
+            models.Index(fields=['created_at'], name='authevent_created_idx'),
+        ]
+
     def __str__(self):
-        return f"Session for {self.user.email}"
\ No newline at end of file
+        return f"{self.kind} {self.email} at {self.created_at}"
@@ -0,0 +1,144 @@
+"""
+Массовое редактирование прав: изменения по многим ролям и элементам
+применяются одним upsert в одной транзакции, а матрица прав
+инвалидируется одним событием после коммита, а не сигналом на каждую строку.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AccessRoleRule, Role
+from .permissions import (
+    ACTIONS, CREATE, DELETE, DELETE_ALL, READ, READ_ALL, UPDATE, UPDATE_ALL, pack_mask,
+)
+from .signals import muted, permissions_changed
+
+FLAG_FIELDS = (
+    'read_permission', 'create_permission', 'update_permission', 'delete_permission',
+    'read_all_permission', 'update_all_permission', 'delete_all_permission',
+)
+
+# Режимы применения маски
+SET = 'set'  # маска заменяет права
+GRANT = 'grant'  # биты маски добавляются к текущим правам
+REVOKE = 'revoke'  # биты маски снимаются
+MODES = (SET, GRANT, REVOKE)
+
+BATCH_SIZE = 500
+
+
+def mask_from_actions(actions):
+    """['read', 'update'] -> READ | UPDATE; неизвестное действие даёт KeyError"""
+    mask = 0
+    for action in actions:
+        mask |= ACTIONS[action]
+    return mask
+
+
+def unpack_mask(mask):
+    return {
+        'read_permission': bool(mask & READ),
+        'create_permission': bool(mask & CREATE),
+        'update_permission': bool(mask & UPDATE),
+        'delete_permission': bool(mask & DELETE),
+        'read_all_permission': bool(mask & READ_ALL),
+        'update_all_permission': bool(mask & UPDATE_ALL),
+        'delete_all_permission': bool(mask & DELETE_ALL),
+    }
+
+
+def _current_masks(pairs):
+    """Текущие маски для пар (role_id, element_id) одним запросом"""
+    role_ids = {role_id for role_id, _ in pairs}
+    element_ids = {element_id for _, element_id in pairs}
+    rows = AccessRoleRule.objects.filter(
+        role_id__in=role_ids, element_id__in=element_ids
+    ).values_list('role_id', 'element_id', *FLAG_FIELDS)
+    return {(role_id, element_id): pack_mask(*flags) for role_id, element_id, *flags in rows}
+
+
+def _delete_pairs(pairs):
+    by_role = {}
+    for role_id, element_id in pairs:
+        by_role.setdefault(role_id, []).append(element_id)
+    if not by_role:
+        return 0
+    condition = reduce(or_, (
+        Q(role_id=role_id, element_id__in=element_ids) for role_id, element_ids in by_role.items()
+    ))
+    deleted, _ = AccessRoleRule.objects.filter(condition).delete()
+    return deleted
+
+
+def _notify(role_ids):
+    role_ids = sorted(set(role_ids))
+    transaction.on_commit(
+        lambda: permissions_changed.send(sender=AccessRoleRule, role_ids=role_ids)
+    )
+
+
+def apply_matrix(changes, mode=SET):
+    """
+    Применяет маски {(role_id, element_id): маска} в одной транзакции.
+    Правила, у которых не осталось прав, удаляются.
+    Возвращает (число сохранённых правил, число удалённых).
+    """
+    if mode not in MODES:
+        raise ValueError(f'Unknown mode: {mode}')
+    changes = dict(changes)
+    if not changes:
+        return 0, 0
+
+    with transaction.atomic(), muted():
+        if mode != SET:
+            current = _current_masks(changes)
+            if mode == GRANT:
+                changes = {pair: current.get(pair, 0) | mask for pair, mask in changes.items()}
+            else:
+                changes = {pair: current.get(pair, 0) & ~mask for pair, mask in changes.items()}
+
+        rules = [
+            AccessRoleRule(role_id=role_id, element_id=element_id, **unpack_mask(mask))
+            for (role_id, element_id), mask in changes.items() if mask
+        ]
+        if rules:
+            AccessRoleRule.objects.bulk_create(
+                rules,
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=('role', 'element'),
+                update_fields=FLAG_FIELDS,
+            )
+        deleted = _delete_pairs([pair for pair, mask in changes.items() if not mask])
+        _notify(role_id for role_id, _ in changes)
+    return len(rules), deleted
+
+
+def apply_to_all(role_ids, element_ids, mask, mode=SET):
+    """Одна маска на все сочетания ролей и элементов"""
+    return apply_matrix(
+        {(role_id, element_id): mask for role_id in role_ids for element_id in element_ids},
+        mode,
+    )
+
+
+def clone_role(source, name, description=None):
+    """Новая роль с полной копией правил source и тем же родителем"""
+    with transaction.atomic(), muted():
+        role = Role.objects.create(
+            name=name,
+            description=source.description if description is None else description,
+            parent_id=source.parent_id,
+        )
+        rules = AccessRoleRule.objects.filter(role=source).values_list('element_id', *FLAG_FIELDS)
+        AccessRoleRule.objects.bulk_create(
+            [
+                AccessRoleRule(role=role, element_id=element_id, **dict(zip(FLAG_FIELDS, flags)))
+                for element_id, *flags in rules
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        _notify([role.pk])
+    return role
@@ -0,0 +1,300 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import AccessRoleRule, BusinessElement, Role
+
+# Битовые маски действий
+READ = 1
+CREATE = 2
+UPDATE = 4
+DELETE = 8
+
+# Право на чужие объекты: бит действия, сдвинутый на ALL_SHIFT.
+# Без него read/update/delete распространяются только на свои объекты
+ALL_SHIFT = 4
+READ_ALL = READ << ALL_SHIFT
+UPDATE_ALL = UPDATE << ALL_SHIFT
+DELETE_ALL = DELETE << ALL_SHIFT
+
+ACTIONS = {
+    'read': READ,
+    'create': CREATE,
+    'update': UPDATE,
+    'delete': DELETE,
+    'read_all': READ_ALL,
+    'update_all': UPDATE_ALL,
+    'delete_all': DELETE_ALL,
+}
+
+# Действия с областью «свои / все»
+SCOPED_ACTIONS = ('read', 'update', 'delete')
+
+# Области, которые возвращает get_scope
+OWN = 'own'
+ALL = 'all'
+
+
+def pack_mask(read, create, update, delete, read_all=False, update_all=False, delete_all=False):
+    """Упаковка семи булевых прав в битовую маску"""
+    return (
+        (READ if read else 0)
+        | (CREATE if create else 0)
+        | (UPDATE if update else 0)
+        | (DELETE if delete else 0)
+        | (READ_ALL if read_all else 0)
+        | (UPDATE_ALL if update_all else 0)
+        | (DELETE_ALL if delete_all else 0)
+    )
+
+
+def rule_mask(rule):
+    return pack_mask(
+        rule.read_permission, rule.create_permission,
+        rule.update_permission, rule.delete_permission,
+        rule.read_all_permission, rule.update_all_permission, rule.delete_all_permission,
+    )
+
+
+def _with_implied(mask):
+    """Право на все объекты включает право на свои"""
+    return mask | (mask >> ALL_SHIFT)
+
+
+class PermissionMatrix:
+    """
+    Скомпилированная матрица прав: role_id -> имя элемента -> маска.
+    Маска роли уже включает права всех её предков (замыкание иерархии)
+    и биты действий, подразумеваемые правами на все объекты,
+    поэтому проверка прав — два поиска в словаре и побитовое И,
+    без обращений к БД и обхода дерева ролей при любой его глубине.
+    """
+
+    def __init__(self):
+        self._masks = {}  # Эффективные маски с унаследованными правами
+        self._own = {}  # Собственные правила ролей: role_id -> имя элемента -> маска
+        self._parents = {}  # role_id -> parent_id
+        self._elements = {}  # element_id -> имя элемента
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.reload_interval = 60
+
+    def load(self):
+        elements = dict(BusinessElement.objects.values_list('id', 'name'))
+        parents = dict(Role.objects.values_list('id', 'parent_id'))
+        own = {}
+        rules = AccessRoleRule.objects.values_list(
+            'role_id', 'element_id', 'read_permission', 'create_permission',
+            'update_permission', 'delete_permission',
+            'read_all_permission', 'update_all_permission', 'delete_all_permission',
+        )
+        for role_id, element_id, *flags in rules.iterator():
+            mask = pack_mask(*flags)
+            if mask:
+                own.setdefault(role_id, {})[elements[element_id]] = mask
+        with self._lock:
+            self._own = own
+            self._parents = parents
+            self._elements = elements
+            # Сначала корни, затем остальные: так проходятся и роли из циклов
+            roots = [role_id for role_id, parent_id in parents.items() if parent_id not in parents]
+            self._masks = self._compile(self._order([*roots, *parents]), {})
+            self.loaded_at = time.monotonic()
+            self.reload_interval = getattr(settings, 'PERMISSION_MATRIX_RELOAD_INTERVAL', 60)
+
+    def check(self, role_id, element_name, action_bit):
+        role_masks = self._masks.get(role_id)
+        if role_masks is None:
+            return False
+        return role_masks.get(element_name, 0) & action_bit != 0
+
+    def mask(self, role_id, element_name):
+        return self._masks.get(role_id, {}).get(element_name, 0)
+
+    # Замыкание иерархии. Вызывается под self._lock
+
+    def _order(self, role_ids):
+        """role_ids и все их потомки; каждая роль идёт после своего родителя"""
+        children = {}
+        for role_id, parent_id in self._parents.items():
+            if parent_id is not None:
+                children.setdefault(parent_id, []).append(role_id)
+        order = []
+        seen = set()
+        for root in role_ids:
+            stack = [root]
+            while stack:
+                role_id = stack.pop()
+                if role_id in seen:
+                    continue
+                seen.add(role_id)
+                order.append(role_id)
+                stack.extend(children.get(role_id, ()))
+        return order
+
+    def _compile(self, order, masks):
+        """Эффективные маски ролей order поверх masks (на месте); возвращает masks"""
+        pending = set(order)
+        for role_id in order:
+            pending.discard(role_id)
+            parent_id = self._parents.get(role_id)
+            # Родитель ещё впереди в order — иерархия зациклена, по этому ребру не наследуем
+            inherited = {} if parent_id in pending else masks.get(parent_id, {})
+            role_masks = dict(inherited)
+            for name, mask in self._own.get(role_id, {}).items():
+                role_masks[name] = role_masks.get(name, 0) | _with_implied(mask)
+            if role_masks:
+                masks[role_id] = role_masks
+            else:
+                masks.pop(role_id, None)
+        return masks
+
+    def _recompile(self, *role_ids):
+        # Подмена словаря целиком, чтобы читатели не видели промежуточного состояния
+        self._masks = self._compile(self._order(role_ids), dict(self._masks))
+
+    # Инкрементальные обновления из сигналов: пересчитываются только роль и её потомки
+
+    def set_rule(self, role_id, element_id, mask):
+        with self._lock:
+            name = self._elements.get(element_id)
+            if name is None:
+                name = BusinessElement.objects.values_list('name', flat=True).get(pk=element_id)
+                self._elements[element_id] = name
+            role_masks = dict(self._own.get(role_id, {}))
+            if mask:
+                role_masks[name] = mask
+            else:
+                role_masks.pop(name, None)
+            self._own = {**self._own, role_id: role_masks}
+            self._recompile(role_id)
+
+    def set_parent(self, role_id, parent_id):
+        with self._lock:
+            if role_id in self._parents and self._parents[role_id] == parent_id:
+                return
+            self._parents = {**self._parents, role_id: parent_id}
+            self._recompile(role_id)
+
+    def drop_role(self, role_id):
+        with self._lock:
+            own = dict(self._own)
+            own.pop(role_id, None)
+            self._own = own
+            parents = dict(self._parents)
+            parents.pop(role_id, None)
+            # Как и в БД (SET_NULL), потомки удалённой роли становятся корнями
+            children = [child for child, parent_id in parents.items() if parent_id == role_id]
+            for child in children:
+                parents[child] = None
+            self._parents = parents
+            masks = dict(self._masks)
+            masks.pop(role_id, None)
+            self._masks = self._compile(self._order(children), masks)
+
+    def set_element(self, element_id, name):
+        with self._lock:
+            old_name = self._elements.get(element_id)
+            self._elements = {**self._elements, element_id: name}
+            if old_name is None or old_name == name:
+                return
+            self._own = _rename(self._own, old_name, name)
+            self._masks = _rename(self._masks, old_name, name)
+
+    def drop_element(self, element_id):
+        with self._lock:
+            name = self._elements.get(element_id)
+            if name is None:
+                return
+            elements = dict(self._elements)
+            del elements[element_id]
+            self._elements = elements
+            self._own = _without(self._own, name)
+            self._masks = _without(self._masks, name)
+
+
+def _rename(masks, old_name, name):
+    renamed = {}
+    for role_id, role_masks in masks.items():
+        if old_name in role_masks:
+            role_masks = dict(role_masks)
+            role_masks[name] = role_masks.pop(old_name)
+        renamed[role_id] = role_masks
+    return renamed
+
+
+def _without(masks, name):
+    return {
+        role_id: {k: v for k, v in role_masks.items() if k != name}
+        for role_id, role_masks in masks.items()
+    }
+
+
+_matrix = PermissionMatrix()
+
+
+def get_matrix():
+    """
+    Матрица прав процесса. Загружается при первом обращении и
+    периодически перечитывается, чтобы подхватить изменения из других воркеров.
+    """
+    loaded_at = _matrix.loaded_at
+    if loaded_at is None or time.monotonic() - loaded_at > _matrix.reload_interval:
+        _matrix.load()
+    return _matrix
+
+
+def has_permission(user, element_name, action):
+    """Проверка права пользователя на действие над элементом"""
+    role_id = getattr(user, 'role_id', None)
+    if role_id is None or not user.is_active:
+        return False
+    matrix = _matrix
+    if matrix.loaded_at is None or time.monotonic() - matrix.loaded_at > matrix.reload_interval:
+        matrix = get_matrix()
+    role_masks = matrix._masks.get(role_id)
+    return role_masks is not None and role_masks.get(element_name, 0) & ACTIONS[action] != 0
+
+
+async def ahas_permission(user, element_name, action):
+    """Асинхронный вариант: в поток уходит только периодическая перезагрузка матрицы"""
+    matrix = _matrix
+    if matrix.loaded_at is None or time.monotonic() - matrix.loaded_at > matrix.reload_interval:
+        await sync_to_async(get_matrix)()
+    return has_permission(user, element_name, action)
+
+
+def get_scope(user, element_name, action):
+    """
+    Область действия над объектами элемента: ALL — над любыми,
+    OWN — только над своими, None — ни над какими.
+    """
+    if action not in SCOPED_ACTIONS:
+        raise ValueError(f'Action has no ownership scope: {action}')
+    role_id = getattr(user, 'role_id', None)
+    if role_id is None or not user.is_active:
+        return None
+    mask = get_matrix().mask(role_id, element_name)
+    if mask & (ACTIONS[action] << ALL_SHIFT):
+        return ALL
+    if mask & ACTIONS[action]:
+        return OWN
+    return None
+
+
+def scope_queryset(user, element_name, action, queryset, owner_field='owner_id'):
+    """
+    queryset, ограниченный правами пользователя: без фильтра при праве
+    на все объекты, owner_field = user.id при праве на свои, none() без права.
+    Список авторизуется одним SQL-запросом, а не проверкой каждого объекта.
+
+        posts = scope_queryset(request.user, 'post', 'read', Post.objects.all())
+    """
+    scope = get_scope(user, element_name, action)
+    if scope == ALL:
+        return queryset
+    if scope == OWN:
+        return queryset.filter(**{owner_field: user.id})
+    return queryset.none()
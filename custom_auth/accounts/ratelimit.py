@@ -0,0 +1,182 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .http import json_response
+
+DEFAULTS = {
+    'ENABLED': True,
+    'LOGIN_PER_IP': (20, 60),  # Попыток входа с одного IP за окно в секундах
+    'FAILURES_PER_EMAIL': (5, 300),  # Неудачных попыток на один email за окно
+    'MAX_KEYS': 100000,  # Размер локального хранилища счётчиков
+    'SHARED_BACKEND': None,  # Алиас из CACHES для общего хранилища воркеров
+    'KEY_PREFIX': 'ratelimit',
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RATE_LIMIT', {}))
+    return config
+
+
+def _estimate(previous, current, elapsed, window):
+    """Скользящее окно по двум фиксированным: вклад прошлого окна убывает линейно"""
+    return previous * (1 - elapsed / window) + current
+
+
+class LocalRateLimitStore:
+    """
+    Счётчики в памяти процесса: на ключ хранится [номер окна, текущее, прошлое].
+    Число ключей ограничено, самые давние вытесняются.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _roll(self, key, window, now):
+        index = int(now // window)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = [index, 0, 0]
+            self._counters[key] = counter
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        elif counter[0] != index:
+            counter[2] = counter[1] if counter[0] == index - 1 else 0
+            counter[1] = 0
+            counter[0] = index
+        self._counters.move_to_end(key)
+        return counter
+
+    def hit(self, key, window, now):
+        with self._lock:
+            counter = self._roll(key, window, now)
+            counter[1] += 1
+            return _estimate(counter[2], counter[1], now % window, window)
+
+    def peek(self, key, window, now):
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                return 0
+            counter = self._roll(key, window, now)
+            return _estimate(counter[2], counter[1], now % window, window)
+
+    def reset(self, key, window, now):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class CacheRateLimitStore:
+    """Общие для всех воркеров счётчики поверх Django cache framework"""
+
+    def __init__(self, alias, key_prefix):
+        self.cache = caches[alias]
+        self.key_prefix = key_prefix
+
+    def _keys(self, key, window, now):
+        index = int(now // window)
+        return f'{self.key_prefix}:{key}:{index}', f'{self.key_prefix}:{key}:{index - 1}'
+
+    def hit(self, key, window, now):
+        current_key, previous_key = self._keys(key, window, now)
+        # add не перезапишет существующий счётчик; incr атомарен в Redis/Memcached
+        self.cache.add(current_key, 0, window * 2)
+        current = self.cache.incr(current_key)
+        previous = self.cache.get(previous_key, 0)
+        return _estimate(previous, current, now % window, window)
+
+    def peek(self, key, window, now):
+        current_key, previous_key = self._keys(key, window, now)
+        values = self.cache.get_many([current_key, previous_key])
+        return _estimate(values.get(previous_key, 0), values.get(current_key, 0), now % window, window)
+
+    def reset(self, key, window, now):
+        self.cache.delete_many(self._keys(key, window, now))
+
+
+class LoginRateLimiter:
+    """
+    Ограничение попыток входа до проверки пароля: по IP считаются все попытки,
+    по email — только неудачные (блокировка подбора пароля к одному аккаунту).
+    """
+
+    def __init__(self, store, per_ip, per_email, enabled=True):
+        self.store = store
+        self.enabled = enabled
+        self.ip_limit, self.ip_window = per_ip
+        self.email_limit, self.email_window = per_email
+        self.stats = {'allowed': 0, 'rejected_ip': 0, 'rejected_email': 0, 'failures': 0}
+
+    def check(self, ip_address, email):
+        """Возвращает 0, если попытку можно пропустить, иначе Retry-After в секундах"""
+        if not self.enabled:
+            return 0
+        now = time.time()
+        if ip_address and self.store.hit(f'ip:{ip_address}', self.ip_window, now) > self.ip_limit:
+            self.stats['rejected_ip'] += 1
+            return self._retry_after(self.ip_window, now)
+        if email and self.store.peek(f'email:{email}', self.email_window, now) >= self.email_limit:
+            self.stats['rejected_email'] += 1
+            return self._retry_after(self.email_window, now)
+        self.stats['allowed'] += 1
+        return 0
+
+    def failure(self, email):
+        if not self.enabled:
+            return
+        self.stats['failures'] += 1
+        if email:
+            self.store.hit(f'email:{email}', self.email_window, time.time())
+
+    def success(self, email):
+        if self.enabled and email:
+            self.store.reset(f'email:{email}', self.email_window, time.time())
+
+    @staticmethod
+    def _retry_after(window, now):
+        return max(1, math.ceil(window - now % window))
+
+
+_limiter = None
+_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                config = get_config()
+                if config['SHARED_BACKEND']:
+                    store = CacheRateLimitStore(config['SHARED_BACKEND'], config['KEY_PREFIX'])
+                else:
+                    store = LocalRateLimitStore(config['MAX_KEYS'])
+                _limiter = LoginRateLimiter(
+                    store, config['LOGIN_PER_IP'], config['FAILURES_PER_EMAIL'], config['ENABLED']
+                )
+    return _limiter
+
+
+def reset():
+    global _limiter
+    with _lock:
+        _limiter = None
+
+
+def get_stats():
+    """Счётчики для мониторинга"""
+    return dict(get_limiter().stats)
+
+
+def too_many_attempts(retry_after):
+    response = json_response({'error': 'Too many login attempts'}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,82 @@
+"""
+Схемы тел запросов для accounts.http.parse_body.
+error_message — текст ошибки по умолчанию, field_errors — тексты для отдельных полей
+(совпадают с прежними ответами API).
+"""
+from datetime import datetime
+from typing import Annotated, ClassVar, List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+Required = Annotated[str, Field(min_length=1)]
+
+
+class Schema(BaseModel):
+    error_message: ClassVar[str] = 'Invalid request'
+    field_errors: ClassVar[dict] = {}
+
+
+class RegisterRequest(Schema):
+    error_message: ClassVar[str] = 'Missing required fields'
+    field_errors: ClassVar[dict] = {'role_id': 'Invalid role ID'}
+
+    email: Required
+    password: Required
+    first_name: Required
+    last_name: Optional[str] = ''
+    role_id: Optional[int] = None
+
+    @field_validator('role_id', mode='before')
+    @classmethod
+    def empty_role(cls, value):
+        # Пустое поле формы означает «без роли»
+        return value or None
+
+
+class LoginRequest(Schema):
+    error_message: ClassVar[str] = 'Missing email or password'
+
+    email: Required
+    password: Required
+
+
+class RefreshRequest(Schema):
+    error_message: ClassVar[str] = 'Missing refresh token'
+
+    refresh_token: Required
+
+
+class UpdateProfileRequest(Schema):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    password: Optional[str] = None
+    password_repeat: Optional[str] = None
+
+
+class BulkPermissionsRequest(Schema):
+    error_message: ClassVar[str] = 'Missing roles or elements'
+    field_errors: ClassVar[dict] = {'mode': 'Invalid mode', 'actions': 'Invalid action'}
+
+    mode: Literal['set', 'grant', 'revoke'] = 'set'
+    roles: List[str] = Field(min_length=1)
+    elements: List[str] = Field(min_length=1)
+    actions: List[Literal['read', 'create', 'update', 'delete', 'read_all', 'update_all', 'delete_all']] = []
+
+
+class CloneRoleRequest(Schema):
+    error_message: ClassVar[str] = 'Missing source or name'
+
+    source: Required
+    name: Required
+    description: Optional[str] = None
+
+
+class AuditQuery(Schema):
+    error_message: ClassVar[str] = 'Invalid query'
+    field_errors: ClassVar[dict] = {'user_id': 'Invalid user ID', 'kind': 'Invalid event kind'}
+
+    user_id: Optional[int] = None
+    kind: Optional[Literal['login', 'login_failed', 'logout', 'profile_update', 'deactivate']] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    limit: int = Field(default=50, ge=1, le=200)
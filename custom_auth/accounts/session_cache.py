@@ -0,0 +1,311 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import UserSession
+from .snapshot import SNAPSHOT_FIELDS, UserSnapshot
+from .utils import session_digest
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,  # Размер локального LRU на процесс
+    'TTL': 300,  # Максимальное время жизни записи в секундах
+    'SHARED_BACKEND': None,  # Алиас из CACHES для общего кеша между воркерами
+    'KEY_PREFIX': 'usersession',
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SESSION_CACHE', {}))
+    return config
+
+
+def _seconds_left(session):
+    return (session.expires_at - timezone.now()).total_seconds()
+
+
+def _clone(session):
+    """
+    Копия сессии, чтобы view не портили кешированный объект.
+    Снимок пользователя неизменяемый и разделяется между копиями.
+    """
+    return copy.copy(session)
+
+
+class LocalSessionCache:
+    """
+    Ограниченный LRU-кеш сессий в памяти процесса.
+    Срок жизни записи не превышает ни TTL, ни expires_at самой сессии.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_id):
+        with self._lock:
+            item = self._data.get(key_id)
+            if item is None:
+                return None
+            deadline, session = item
+            if deadline <= time.monotonic():
+                del self._data[key_id]
+                return None
+            self._data.move_to_end(key_id)
+            return session
+
+    def set(self, key_id, session):
+        timeout = min(self.ttl, _seconds_left(session))
+        if timeout <= 0:
+            self.delete(key_id)
+            return
+        with self._lock:
+            self._data[key_id] = (time.monotonic() + timeout, session)
+            self._data.move_to_end(key_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key_id):
+        with self._lock:
+            self._data.pop(key_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedSessionCache:
+    """
+    Общий кеш сессий поверх Django cache framework (Redis, Memcached и т.д.).
+    При инвалидации оставляет метку отзыва, по которой остальные воркеры
+    выбрасывают запись из своего локального LRU.
+    """
+
+    def __init__(self, alias, ttl, key_prefix):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    def _key(self, key_id):
+        return f'{self.key_prefix}:{key_id}'
+
+    def _revoked_key(self, key_id):
+        return f'{self.key_prefix}:revoked:{key_id}'
+
+    def get(self, key_id):
+        return self.cache.get(self._key(key_id))
+
+    def is_revoked(self, key_id):
+        return self.cache.get(self._revoked_key(key_id)) is not None
+
+    def set(self, key_id, session):
+        timeout = int(min(self.ttl, _seconds_left(session)))
+        if timeout <= 0:
+            self.delete(key_id)
+            return
+        self.cache.set(self._key(key_id), session, timeout)
+
+    def delete(self, key_id):
+        self.cache.delete(self._key(key_id))
+
+    def revoke(self, key_id):
+        # Метка живёт не меньше любой локальной записи
+        self.cache.set(self._revoked_key(key_id), True, self.ttl)
+        self.cache.delete(self._key(key_id))
+
+    def unrevoke(self, key_id):
+        self.cache.delete(self._revoked_key(key_id))
+
+    # Асинхронные варианты для require_auth под ASGI
+
+    async def aget(self, key_id):
+        return await self.cache.aget(self._key(key_id))
+
+    async def ais_revoked(self, key_id):
+        return await self.cache.aget(self._revoked_key(key_id)) is not None
+
+    async def aset(self, key_id, session):
+        timeout = int(min(self.ttl, _seconds_left(session)))
+        if timeout > 0:
+            await self.cache.aset(self._key(key_id), session, timeout)
+
+    async def aunrevoke(self, key_id):
+        await self.cache.adelete(self._revoked_key(key_id))
+
+
+_local = None
+_shared = None
+_lock = threading.Lock()
+
+
+def _backends():
+    global _local, _shared
+    if _local is None:
+        with _lock:
+            if _local is None:
+                config = get_config()
+                if config['SHARED_BACKEND']:
+                    _shared = SharedSessionCache(
+                        config['SHARED_BACKEND'], config['TTL'], config['KEY_PREFIX']
+                    )
+                _local = LocalSessionCache(config['MAX_ENTRIES'], config['TTL'])
+    return _local, _shared
+
+
+def reset():
+    """Сброс кешей (например, после изменения настроек в тестах)"""
+    global _local, _shared
+    with _lock:
+        _local = None
+        _shared = None
+
+
+def get_session(session_key):
+    """
+    Возвращает сессию со снимком пользователя в session.snapshot или None.
+    При попадании в кеш запросов к БД нет, при промахе — один запрос с JOIN.
+    Кеши, как и БД, знают только хеш ключа.
+    """
+    digest = session_digest(session_key)
+    if not get_config()['ENABLED']:
+        return _load(digest)
+
+    key_id = digest.hex()
+    local, shared = _backends()
+    session = local.get(key_id)
+    if session is not None and shared is not None and shared.is_revoked(key_id):
+        local.delete(key_id)
+        session = None
+
+    if session is None and shared is not None:
+        session = shared.get(key_id)
+        if session is not None:
+            local.set(key_id, session)
+
+    if session is None:
+        session = _load(digest)
+        if session is None:
+            return None
+        store_session(session)
+
+    return _clone(session)
+
+
+async def aget_session(session_key):
+    """
+    Асинхронный get_session: локальный LRU без ожиданий,
+    общий кеш через async API кеша, промах — через async ORM.
+    """
+    digest = session_digest(session_key)
+    if not get_config()['ENABLED']:
+        return await _aload(digest)
+
+    key_id = digest.hex()
+    local, shared = _backends()
+    session = local.get(key_id)
+    if session is not None and shared is not None and await shared.ais_revoked(key_id):
+        local.delete(key_id)
+        session = None
+
+    if session is None and shared is not None:
+        session = await shared.aget(key_id)
+        if session is not None:
+            local.set(key_id, session)
+
+    if session is None:
+        session = await _aload(digest)
+        if session is None:
+            return None
+        await astore_session(session)
+
+    return _clone(session)
+
+
+SESSION_FIELDS = [field.attname for field in UserSession._meta.concrete_fields]
+USER_FIELDS = [f'user__{name}' for name in SNAPSHOT_FIELDS]
+
+
+def _load(digest):
+    # Только нужные столбцы пользователя, без password_hash
+    row = UserSession.objects.filter(key_digest=digest).values_list(
+        *SESSION_FIELDS, *USER_FIELDS
+    ).first()
+    return _from_row(row)
+
+
+def _from_row(row):
+    if row is None:
+        return None
+    split = len(SESSION_FIELDS)
+    session = UserSession.from_db(UserSession.objects.db, SESSION_FIELDS, row[:split])
+    session.snapshot = UserSnapshot(*row[split:])
+    return session
+
+
+async def _aload(digest):
+    row = await UserSession.objects.filter(key_digest=digest).values_list(
+        *SESSION_FIELDS, *USER_FIELDS
+    ).afirst()
+    return _from_row(row)
+
+
+def store_session(session):
+    """Запись (или обновление) сессии в кеше после изменения"""
+    if not get_config()['ENABLED']:
+        return
+    local, shared = _backends()
+    if _seconds_left(session) <= 0:
+        invalidate_session(session.key_id)
+        return
+    cached = _clone(session)
+    local.set(session.key_id, cached)
+    if shared is not None:
+        shared.unrevoke(session.key_id)
+        shared.set(session.key_id, cached)
+
+
+async def astore_session(session):
+    if not get_config()['ENABLED']:
+        return
+    local, shared = _backends()
+    if _seconds_left(session) <= 0:
+        local.delete(session.key_id)
+        return
+    cached = _clone(session)
+    local.set(session.key_id, cached)
+    if shared is not None:
+        await shared.aunrevoke(session.key_id)
+        await shared.aset(session.key_id, cached)
+
+
+def invalidate_session(key_id):
+    """Удаление сессии из кеша на всех воркерах; key_id — session.key_id"""
+    if not get_config()['ENABLED']:
+        return
+    local, shared = _backends()
+    local.delete(key_id)
+    if shared is not None:
+        shared.revoke(key_id)
+
+
+def invalidate_user_sessions(user, keep=None):
+    """Сброс всех закешированных сессий пользователя, кроме keep"""
+    if not get_config()['ENABLED']:
+        return
+    digests = UserSession.objects.filter(
+        user_id=user.pk, expires_at__gt=timezone.now()
+    ).values_list('key_digest', flat=True)
+    for digest in digests:
+        key_id = bytes(digest).hex()
+        if keep is None or key_id != keep.key_id:
+            invalidate_session(key_id)
+    if keep is not None:
+        store_session(keep)
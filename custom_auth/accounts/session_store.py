@@ -0,0 +1,558 @@
+"""
+Хранилища сессий с общим интерфейсом. View и require_auth работают
+только через get_store(), реализация выбирается настройкой SESSION_STORE:
+
+- 'db' — строки UserSession в БД, чтение через кеш session_cache;
+- 'cache' — сессии только в кеше (Redis, Memcached), БД не используется;
+- 'hybrid' — чтение и запись в кеш, в БД сессии пишутся
+  отложенно пачками (write-behind).
+
+Сессия во всех хранилищах — экземпляр UserSession со снимком
+пользователя в session.snapshot; у сессий из кеша pk может быть None.
+"""
+import atexit
+import copy
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from . import session_cache, session_touch
+from .models import UserSession
+from .snapshot import UserSnapshot
+from .utils import generate_session_key, get_expiration_time, session_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'db',  # 'db', 'cache' или 'hybrid'
+    'CACHE': 'default',  # Алиас из CACHES для 'cache' и 'hybrid'
+    'KEY_PREFIX': 'sessionstore',
+    'FLUSH_INTERVAL': 5,  # 'hybrid': как часто (в секундах) писать накопленное в БД
+    'MAX_PENDING': 1000,  # 'hybrid': сбрасывать раньше, если накопилось столько записей
+    'MAX_PER_USER': None,  # Лимит одновременных сессий; при входе сверх него завершаются самые старые
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SESSION_STORE', {}))
+    return config
+
+
+def _seconds_left(session):
+    return (session.expires_at - timezone.now()).total_seconds()
+
+
+def _new_session(user, ip_address, user_agent):
+    return UserSession(
+        user_id=user.pk,
+        session_key=generate_session_key(),
+        ip_address=ip_address,
+        user_agent=user_agent,
+        created_at=timezone.now(),
+        expires_at=get_expiration_time(),
+    )
+
+
+def _renewal(session):
+    """Новый expires_at для скользящего срока жизни или None, если продлевать рано"""
+    config = session_touch.get_config()
+    if not config['ENABLED']:
+        return None
+    if session.expires_at - timezone.now() >= timedelta(hours=config['RENEW_THRESHOLD_HOURS']):
+        return None
+    return get_expiration_time(config['LIFETIME_HOURS'])
+
+
+class SessionStore:
+    """Интерфейс хранилища сессий"""
+
+    def create(self, user, ip_address, user_agent):
+        """Новая сессия пользователя"""
+        raise NotImplementedError
+
+    def get(self, session_key):
+        """Сессия со снимком пользователя или None; истёкшие проверяет вызывающий"""
+        raise NotImplementedError
+
+    def touch(self, session):
+        """Продление сессии при скользящем сроке жизни; True, если продлена"""
+        raise NotImplementedError
+
+    # Асинхронные варианты для require_auth под ASGI. По умолчанию — через поток,
+    # бэкенды переопределяют aget, чтобы обычный путь обходился без него.
+
+    async def aget(self, session_key):
+        return await sync_to_async(self.get)(session_key)
+
+    async def atouch(self, session):
+        # Продлевать нужно редко (раз в RENEW_THRESHOLD_HOURS), проверка — в памяти
+        if _renewal(session) is None:
+            return False
+        return await sync_to_async(self.touch)(session)
+
+    def expire(self, session):
+        """Завершение сессии (logout)"""
+        raise NotImplementedError
+
+    def refresh_user(self, user, keep=None):
+        """
+        Обновление снимка пользователя во всех его сессиях после изменения профиля.
+        keep — текущая сессия с уже обновлённым снимком.
+        """
+        raise NotImplementedError
+
+    def list_sessions(self, user):
+        """Активные сессии пользователя, новые первыми"""
+        raise NotImplementedError
+
+    def revoke(self, user, session_id):
+        """Завершение сессии пользователя по session.key_id; True, если она найдена"""
+        raise NotImplementedError
+
+    def revoke_others(self, user, keep=None):
+        """Завершение всех сессий пользователя, кроме keep; возвращает их число"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Запись отложенных изменений; возвращает число записанных строк"""
+        return 0
+
+    def stop(self):
+        """Остановка фоновых потоков хранилища"""
+
+
+def _session_limit():
+    """Сколько старых сессий можно оставить перед созданием новой, или None"""
+    limit = get_config()['MAX_PER_USER']
+    return None if not limit else limit - 1
+
+
+class DatabaseSessionStore(SessionStore):
+    """Строки UserSession в БД; чтение через session_cache, продления пачками"""
+
+    def create(self, user, ip_address, user_agent):
+        keep = _session_limit()
+        if keep is not None:
+            self._expire(self._active(user).order_by('-created_at', '-pk')[keep:])
+        session = _new_session(user, ip_address, user_agent)
+        session.save(force_insert=True)
+        return session
+
+    @staticmethod
+    def _active(user):
+        # Покрывается индексом (user, expires_at)
+        return UserSession.objects.filter(user_id=user.pk, expires_at__gt=timezone.now())
+
+    @staticmethod
+    def _expire(queryset):
+        """
+        Один SELECT хешей ключей и один UPDATE; хеши нужны, чтобы сбросить кеш.
+        Отложенные продления таких сессий не применятся: flush_touches
+        обновляет только ещё активные строки.
+        """
+        stale = {pk: bytes(digest).hex() for pk, digest in queryset.values_list('pk', 'key_digest')}
+        return DatabaseSessionStore._expire_keys(stale)
+
+    @staticmethod
+    def _expire_keys(stale):
+        """stale: pk -> key_id"""
+        if not stale:
+            return 0
+        count = UserSession.objects.filter(pk__in=stale).update(expires_at=timezone.now())
+        for key_id in stale.values():
+            session_cache.invalidate_session(key_id)
+        return count
+
+    def get(self, session_key):
+        return session_cache.get_session(session_key)
+
+    async def aget(self, session_key):
+        return await session_cache.aget_session(session_key)
+
+    def touch(self, session):
+        return session_touch.touch_session(session)
+
+    def expire(self, session):
+        session_touch.discard_touch(session)
+        session.expires_at = timezone.now()
+        session.save(update_fields=['expires_at'])
+        session_cache.invalidate_session(session.key_id)
+
+    def refresh_user(self, user, keep=None):
+        session_cache.invalidate_user_sessions(user, keep=keep)
+
+    def list_sessions(self, user):
+        return list(self._active(user).order_by('-created_at', '-pk'))
+
+    def revoke(self, user, session_id):
+        # Один UPDATE по уникальному индексу key_digest, без выборки сессий пользователя
+        try:
+            digest = bytes.fromhex(session_id)
+        except ValueError:
+            return False
+        if not self._active(user).filter(key_digest=digest).update(expires_at=timezone.now()):
+            return False
+        session_cache.invalidate_session(digest.hex())
+        return True
+
+    def revoke_others(self, user, keep=None):
+        active = self._active(user)
+        if keep is not None:
+            active = active.exclude(key_digest=keep.key_digest)
+        return self._expire(active)
+
+    def flush(self):
+        return session_touch.flush_touches()
+
+
+class CacheSessionStore(SessionStore):
+    """
+    Сессии только в кеше под хешем ключа. Для каждого пользователя хранится
+    список хешей его ключей, чтобы обновлять снимок во всех сессиях.
+    """
+
+    # Завершённая сессия; не даёт hybrid дочитать её из БД до сброса буфера
+    TOMBSTONE = 'expired'
+
+    def __init__(self, alias, key_prefix):
+        self.cache = caches[alias]
+        self.key_prefix = key_prefix
+
+    def _key(self, key_id):
+        return f'{self.key_prefix}:{key_id}'
+
+    def _user_key(self, user_id):
+        return f'{self.key_prefix}:user:{user_id}'
+
+    def _save(self, session):
+        timeout = int(_seconds_left(session))
+        if timeout <= 0:
+            return
+        self.cache.set(self._key(session.key_id), session, timeout)
+        user_key = self._user_key(session.user_id)
+        keys = self.cache.get(user_key) or []
+        if session.key_id not in keys:
+            keys.append(session.key_id)
+        # Список живёт не меньше самой долгой сессии; мёртвые ключи чистит refresh_user
+        lifetime = int(session_touch.get_config()['LIFETIME_HOURS'] * 3600)
+        self.cache.set(user_key, keys, max(timeout, lifetime))
+
+    def _read(self, key_id):
+        return self.cache.get(self._key(key_id))
+
+    def create(self, user, ip_address, user_agent):
+        keep = _session_limit()
+        if keep is not None:
+            for stale in self.list_sessions(user)[keep:]:
+                self.expire(stale)
+        session = _new_session(user, ip_address, user_agent)
+        session.snapshot = UserSnapshot.from_user(user)
+        self._save(session)
+        return session
+
+    def get(self, session_key):
+        session = self._read(session_digest(session_key).hex())
+        if session is None or session == self.TOMBSTONE:
+            return None
+        return copy.copy(session)
+
+    async def aget(self, session_key):
+        session = await self.cache.aget(self._key(session_digest(session_key).hex()))
+        if session is None or session == self.TOMBSTONE:
+            return None
+        return copy.copy(session)
+
+    def touch(self, session):
+        expires_at = _renewal(session)
+        if expires_at is None:
+            return False
+        session.expires_at = expires_at
+        self._save(session)
+        return True
+
+    def expire(self, session):
+        session.expires_at = timezone.now()
+        self.cache.delete(self._key(session.key_id))
+
+    def list_sessions(self, user):
+        keys = self.cache.get(self._user_key(user.pk)) or []
+        if not keys:
+            return []
+        cached = self.cache.get_many([self._key(key) for key in keys])
+        sessions = [
+            copy.copy(session) for session in cached.values()
+            if session != self.TOMBSTONE and session.is_active()
+        ]
+        sessions.sort(key=lambda session: session.created_at, reverse=True)
+        return sessions
+
+    def revoke(self, user, session_id):
+        for session in self.list_sessions(user):
+            if session.key_id == session_id:
+                self.expire(session)
+                return True
+        return False
+
+    def revoke_others(self, user, keep=None):
+        count = 0
+        for session in self.list_sessions(user):
+            if keep is None or session.key_id != keep.key_id:
+                self.expire(session)
+                count += 1
+        return count
+
+    def refresh_user(self, user, keep=None):
+        user_key = self._user_key(user.pk)
+        keys = self.cache.get(user_key) or []
+        if not keys:
+            return
+        snapshot = keep.snapshot if keep is not None else UserSnapshot.load(user.pk)
+        sessions = self.cache.get_many([self._key(key) for key in keys])
+        alive = []
+        longest = 0
+        for key in keys:
+            session = sessions.get(self._key(key))
+            if session is None or session == self.TOMBSTONE:
+                continue
+            timeout = int(_seconds_left(session))
+            if timeout <= 0:
+                continue
+            session.snapshot = snapshot
+            self.cache.set(self._key(key), session, timeout)
+            alive.append(key)
+            longest = max(longest, timeout)
+        if alive:
+            self.cache.set(user_key, alive, longest)
+        else:
+            self.cache.delete(user_key)
+
+
+class WriteBehindBuffer:
+    """
+    Новые сессии и изменения expires_at, ожидающие записи в БД.
+    Пишутся фоновым потоком раз в flush_interval секунд, а также сразу,
+    если накопилось max_pending записей.
+    """
+
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._inserts = {}  # key_id -> UserSession
+        self._updates = {}  # key_id -> expires_at
+        self._lock = threading.Lock()
+        # Сбросы идут по очереди, чтобы UPDATE не обогнал INSERT той же сессии
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def insert(self, session):
+        with self._lock:
+            self._inserts[session.key_id] = session
+            self._start()
+        self._maybe_flush()
+
+    def update(self, session):
+        with self._lock:
+            pending = self._inserts.get(session.key_id)
+            if pending is not None:
+                pending.expires_at = session.expires_at
+            else:
+                self._updates[session.key_id] = session.expires_at
+            self._start()
+        self._maybe_flush()
+
+    def pending(self, key_id):
+        """Ещё не записанная в БД новая сессия"""
+        with self._lock:
+            return self._inserts.get(key_id)
+
+    def pending_expiry(self, key_id):
+        """Ещё не записанный в БД expires_at существующей сессии или None"""
+        with self._lock:
+            return self._updates.get(key_id)
+
+    def _start(self):
+        if self._thread is None and not self._stopped.is_set():
+            self._thread = threading.Thread(target=self._run, name='session-write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # Сброс по таймеру: без него завершение сессии ждало бы следующей записи
+        while not self._stopped.wait(self.flush_interval):
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                continue
+            try:
+                self.flush()
+            except DatabaseError:
+                logger.exception('Failed to flush pending session writes')
+            close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _maybe_flush(self):
+        if (time.monotonic() - self._last_flush >= self.flush_interval
+                or len(self._inserts) + len(self._updates) >= self.max_pending):
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            inserts, self._inserts = self._inserts, {}
+            updates, self._updates = self._updates, {}
+            self._last_flush = time.monotonic()
+        written = 0
+        if inserts:
+            rows = []
+            for session in inserts.values():
+                row = copy.copy(session)
+                row.__dict__.pop('snapshot', None)
+                rows.append(row)
+            written += len(UserSession.objects.bulk_create(rows, batch_size=500))
+        if updates:
+            now = timezone.now()
+            updates = {bytes.fromhex(key_id): value for key_id, value in updates.items()}
+            # Продления не воскрешают уже завершённые сессии, завершения пишутся всегда
+            renewals = {key: value for key, value in updates.items() if value > now}
+            endings = {key: value for key, value in updates.items() if value <= now}
+            if renewals:
+                written += self._update(
+                    UserSession.objects.filter(key_digest__in=renewals, expires_at__gt=now), renewals
+                )
+            if endings:
+                written += self._update(UserSession.objects.filter(key_digest__in=endings), endings)
+        return written
+
+    @staticmethod
+    def _update(queryset, values):
+        return queryset.update(expires_at=Case(
+            *[When(key_digest=digest, then=Value(expires_at)) for digest, expires_at in values.items()],
+            output_field=DateTimeField(),
+        ))
+
+
+class HybridSessionStore(CacheSessionStore):
+    """
+    Чтение и запись через кеш, в БД — отложенно пачками.
+    При промахе кеша сессия дочитывается из БД и снова кешируется.
+    Завершения сессий (в том числе массовые) пишутся одним UPDATE при сбросе.
+    """
+
+    def __init__(self, alias, key_prefix, flush_interval, max_pending):
+        super().__init__(alias, key_prefix)
+        self.buffer = WriteBehindBuffer(flush_interval, max_pending)
+
+    def create(self, user, ip_address, user_agent):
+        session = super().create(user, ip_address, user_agent)
+        self.buffer.insert(copy.copy(session))
+        return session
+
+    def get(self, session_key):
+        digest = session_digest(session_key)
+        key_id = digest.hex()
+        cached = self._read(key_id)
+        if cached == self.TOMBSTONE:
+            return None
+        if cached is not None:
+            return copy.copy(cached)
+        session = self.buffer.pending(key_id)
+        if session is not None:
+            return copy.copy(session)
+        session = session_cache._load(digest)
+        if session is None:
+            return None
+        # Завершение или продление могло ещё не дойти до БД
+        expires_at = self.buffer.pending_expiry(key_id)
+        if expires_at is not None:
+            session.expires_at = expires_at
+        if _seconds_left(session) > 0:
+            self._save(session)
+        return session
+
+    async def aget(self, session_key):
+        cached = await self.cache.aget(self._key(session_digest(session_key).hex()))
+        if cached == self.TOMBSTONE:
+            return None
+        if cached is not None:
+            return copy.copy(cached)
+        # Промах кеша: дочитывание из БД и повторное кеширование
+        return await sync_to_async(self.get)(session_key)
+
+    def touch(self, session):
+        if not super().touch(session):
+            return False
+        self.buffer.update(session)
+        return True
+
+    def expire(self, session):
+        super().expire(session)
+        # До записи в БД старая строка ещё считается активной
+        self.cache.set(
+            self._key(session.key_id), self.TOMBSTONE, max(60, self.buffer.flush_interval * 2)
+        )
+        self.buffer.update(session)
+
+    def flush(self):
+        return self.buffer.flush()
+
+    def stop(self):
+        self.buffer.stop()
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                config = get_config()
+                backend = config['BACKEND']
+                if backend == 'db':
+                    _store = DatabaseSessionStore()
+                elif backend == 'cache':
+                    _store = CacheSessionStore(config['CACHE'], config['KEY_PREFIX'])
+                elif backend == 'hybrid':
+                    _store = HybridSessionStore(
+                        config['CACHE'], config['KEY_PREFIX'],
+                        config['FLUSH_INTERVAL'], config['MAX_PENDING'],
+                    )
+                else:
+                    raise ValueError(f'Unknown session store backend: {backend}')
+    return _store
+
+
+def reset():
+    """
+    Сброс хранилища (например, после изменения настроек в тестах).
+    Отложенные записи не сбрасываются: при необходимости вызовите flush_store() до этого.
+    """
+    global _store
+    with _lock:
+        store, _store = _store, None
+    if store is not None:
+        store.stop()
+
+
+def flush_store():
+    if _store is not None:
+        return _store.flush()
+    return 0
+
+
+atexit.register(flush_store)
@@ -0,0 +1,87 @@
+import atexit
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .models import UserSession
+from .session_cache import store_session
+from .utils import get_expiration_time
+
+DEFAULTS = {
+    'ENABLED': False,
+    'LIFETIME_HOURS': 24,  # На сколько продлевается сессия
+    'RENEW_THRESHOLD_HOURS': 12,  # Продлевать, только если осталось меньше
+    'FLUSH_INTERVAL': 30,  # Как часто (в секундах) сбрасывать продления в БД
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SESSION_SLIDING', {}))
+    return config
+
+
+class TouchBuffer:
+    """
+    Накопитель продлений сессий. Вместо session.save() на каждый запрос
+    новые expires_at копятся в памяти и пишутся одним UPDATE раз в интервал.
+    """
+
+    def __init__(self):
+        self._pending = {}  # pk сессии -> новый expires_at
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, session, config):
+        threshold = timedelta(hours=config['RENEW_THRESHOLD_HOURS'])
+        if session.expires_at - timezone.now() >= threshold:
+            return False
+        session.expires_at = get_expiration_time(config['LIFETIME_HOURS'])
+        with self._lock:
+            self._pending[session.pk] = session.expires_at
+        store_session(session)
+        if time.monotonic() - self._last_flush >= config['FLUSH_INTERVAL']:
+            self.flush()
+        return True
+
+    def discard(self, session):
+        with self._lock:
+            self._pending.pop(session.pk, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        # Уже завершённые (logout) сессии не воскрешаем
+        return UserSession.objects.filter(
+            pk__in=pending, expires_at__gt=timezone.now()
+        ).update(expires_at=Case(
+            *[When(pk=pk, then=Value(expires_at)) for pk, expires_at in pending.items()],
+            output_field=DateTimeField(),
+        ))
+
+
+_buffer = TouchBuffer()
+atexit.register(_buffer.flush)
+
+
+def touch_session(session):
+    """Продление сессии в режиме скользящего срока жизни"""
+    config = get_config()
+    if config['ENABLED']:
+        return _buffer.touch(session, config)
+    return False
+
+
+def discard_touch(session):
+    _buffer.discard(session)
+
+
+def flush_touches():
+    return _buffer.flush()
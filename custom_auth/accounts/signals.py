@@ -0,0 +1,87 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import audit, ratelimit, session_cache, session_store
+from .models import AccessRoleRule, BusinessElement, Role
+from .permissions import _matrix, rule_mask
+
+
+@receiver(setting_changed)
+def reset_on_setting_change(setting, **kwargs):
+    """Пересоздание синглтонов при override_settings в тестах"""
+    if setting == 'SESSION_CACHE':
+        session_cache.reset()
+    elif setting == 'SESSION_STORE':
+        session_store.reset()
+    elif setting == 'RATE_LIMIT':
+        ratelimit.reset()
+    elif setting == 'AUDIT_LOG':
+        audit.reset()
+
+
+# Одно событие на массовое изменение прав (аргумент role_ids)
+permissions_changed = Signal()
+
+_muted = contextvars.ContextVar('permission_signals_muted', default=False)
+
+
+@contextmanager
+def muted():
+    """Отключает построчные обработчики на время массовой операции"""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def _track():
+    return _matrix.loaded_at is not None and not _muted.get()
+
+
+@receiver(permissions_changed)
+def permissions_bulk_changed(sender, role_ids=None, **kwargs):
+    if _matrix.loaded_at is not None:
+        _matrix.load()
+
+
+# Матрица прав обновляется точечно; пока она не загружена, обновлять нечего
+
+@receiver(post_save, sender=AccessRoleRule)
+def rule_saved(sender, instance, **kwargs):
+    if _track():
+        _matrix.set_rule(instance.role_id, instance.element_id, rule_mask(instance))
+
+
+@receiver(post_delete, sender=AccessRoleRule)
+def rule_deleted(sender, instance, **kwargs):
+    if _track():
+        _matrix.set_rule(instance.role_id, instance.element_id, 0)
+
+
+@receiver(post_save, sender=Role)
+def role_saved(sender, instance, **kwargs):
+    if _track():
+        _matrix.set_parent(instance.pk, instance.parent_id)
+
+
+@receiver(post_delete, sender=Role)
+def role_deleted(sender, instance, **kwargs):
+    if _track():
+        _matrix.drop_role(instance.pk)
+
+
+@receiver(post_save, sender=BusinessElement)
+def element_saved(sender, instance, **kwargs):
+    if _track():
+        _matrix.set_element(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=BusinessElement)
+def element_deleted(sender, instance, **kwargs):
+    if _track():
+        _matrix.drop_element(instance.pk)
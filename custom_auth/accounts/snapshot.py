@@ -0,0 +1,89 @@
+import hashlib
+
+from .http import dumps
+from .models import User
+
+# Поля User, которые попадают в снимок (password_hash никогда не загружается)
+SNAPSHOT_FIELDS = ('id', 'email', 'first_name', 'last_name', 'role_id', 'role__name', 'is_active')
+
+
+class UserSnapshot:
+    """
+    Компактный неизменяемый снимок пользователя для request.user.
+    Один экземпляр безопасно разделяется между запросами и кешируется вместе с сессией.
+    """
+
+    __slots__ = (
+        'id', 'email', 'first_name', 'last_name', 'role_id', 'role_name', 'is_active',
+        '_etag', '_body',
+    )
+
+    def __init__(self, id, email, first_name, last_name, role_id, role_name, is_active):
+        set_ = object.__setattr__
+        set_(self, 'id', id)
+        set_(self, 'email', email)
+        set_(self, 'first_name', first_name)
+        set_(self, 'last_name', last_name)
+        set_(self, 'role_id', role_id)
+        set_(self, 'role_name', role_name)
+        set_(self, 'is_active', is_active)
+        set_(self, '_etag', None)
+        set_(self, '_body', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('UserSnapshot is immutable')
+
+    def __reduce__(self):
+        return (UserSnapshot, (
+            self.id, self.email, self.first_name, self.last_name,
+            self.role_id, self.role_name, self.is_active,
+        ))
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} {self.email}>'
+
+    @property
+    def pk(self):
+        return self.id
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            user.id, user.email, user.first_name, user.last_name,
+            user.role_id, user.role.name if user.role_id else None, user.is_active,
+        )
+
+    @classmethod
+    def load(cls, user_id):
+        """Один запрос только нужных столбцов"""
+        row = User.objects.filter(pk=user_id).values_list(*SNAPSHOT_FIELDS).get()
+        return cls(*row)
+
+    @classmethod
+    async def aload(cls, user_id):
+        row = await User.objects.filter(pk=user_id).values_list(*SNAPSHOT_FIELDS).aget()
+        return cls(*row)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'role': self.role_name,
+            'is_active': self.is_active,
+        }
+
+    @property
+    def body(self):
+        """JSON профиля, сериализуется один раз на снимок"""
+        if self._body is None:
+            object.__setattr__(self, '_body', dumps(self.to_dict()))
+        return self._body
+
+    @property
+    def etag(self):
+        if self._etag is None:
+            digest = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+            object.__setattr__(self, '_etag', f'"{digest}"')
+        return self._etag
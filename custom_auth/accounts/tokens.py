@@ -0,0 +1,106 @@
+import uuid
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+class TokenError(Exception):
+    """Токен недействителен, просрочен или отозван"""
+
+
+def _config():
+    return settings.JWT_CONFIG
+
+
+def _lifetime(token_type):
+    config = _config()
+    if token_type == ACCESS:
+        return timedelta(hours=config['ACCESS_TOKEN_LIFETIME_HOURS'])
+    return timedelta(days=config['REFRESH_TOKEN_LIFETIME_DAYS'])
+
+
+def _encode(user, token_type):
+    config = _config()
+    now = timezone.now()
+    payload = {
+        'sub': str(user.id),
+        'email': user.email,
+        'role': user.role.name if user.role else None,
+        'type': token_type,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + _lifetime(token_type),
+    }
+    return jwt.encode(payload, config['SECRET_KEY'], algorithm=config['ALGORITHM'])
+
+
+def issue_tokens(user):
+    """Пара access/refresh токенов для пользователя"""
+    return {
+        'access_token': _encode(user, ACCESS),
+        'refresh_token': _encode(user, REFRESH),
+        'token_type': _config()['AUTH_HEADER_TYPES'][0],
+        'expires_in': int(_lifetime(ACCESS).total_seconds()),
+    }
+
+
+def _verify(token, token_type):
+    """Подпись, срок действия и тип токена"""
+    config = _config()
+    try:
+        payload = jwt.decode(
+            token, config['SECRET_KEY'], algorithms=[config['ALGORITHM']],
+            options={'require': ['sub', 'jti', 'exp', 'type']},
+        )
+    except jwt.ExpiredSignatureError:
+        raise TokenError('Token expired')
+    except jwt.InvalidTokenError:
+        raise TokenError('Invalid token')
+
+    if payload['type'] != token_type:
+        raise TokenError('Invalid token type')
+    return payload
+
+
+def decode_token(token, token_type=ACCESS):
+    """
+    Проверка подписи, срока действия и типа токена без обращения к БД.
+    Единственное общее состояние — список отозванных jti в кеше.
+    """
+    payload = _verify(token, token_type)
+    if is_revoked(payload['jti']):
+        raise TokenError('Token revoked')
+    return payload
+
+
+async def adecode_token(token, token_type=ACCESS):
+    """Асинхронный вариант decode_token: список отзыва читается через async API кеша"""
+    payload = _verify(token, token_type)
+    if await ais_revoked(payload['jti']):
+        raise TokenError('Token revoked')
+    return payload
+
+
+def _revocation_cache():
+    return caches[_config().get('REVOCATION_CACHE', 'default')]
+
+
+def revoke(payload):
+    """Отзыв токена до окончания его срока действия"""
+    timeout = int(payload['exp'] - timezone.now().timestamp())
+    if timeout > 0:
+        _revocation_cache().set(f"jwt:revoked:{payload['jti']}", True, timeout)
+
+
+def is_revoked(jti):
+    return _revocation_cache().get(f'jwt:revoked:{jti}') is not None
+
+
+async def ais_revoked(jti):
+    return await _revocation_cache().aget(f'jwt:revoked:{jti}') is not None
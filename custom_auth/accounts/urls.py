@@ -1,8 +1,11 @@
 from django.urls import path
 from .views import (
     register_user, login_user, logout_user,
-    update_profile, delete_account
+    update_profile, delete_account, refresh_token, metrics, me,
+    bulk_permissions, clone_role_view,
+    list_sessions, revoke_session, revoke_other_sessions, audit_events
 )
+from .async_views import ame, alogin_user, aregister_user, aupdate_profile
 
 app_name = 'accounts'
 
@@ -13,4 +16,19 @@ urlpatterns = [
     path('logout/', logout_user, name='logout'),
     path('update-profile/', update_profile, name='update_profile'),
     path('delete-account/', delete_account, name='delete_account'),
+    path('token/refresh/', refresh_token, name='token_refresh'),
+    path('me/', me, name='me'),
+    path('sessions/', list_sessions, name='sessions'),
+    path('sessions/revoke-others/', revoke_other_sessions, name='sessions_revoke_others'),
+    path('sessions/<str:session_id>/revoke/', revoke_session, name='session_revoke'),
+    path('audit/', audit_events, name='audit'),
+    path('metrics/', metrics, name='metrics'),
+    path('permissions/bulk/', bulk_permissions, name='permissions_bulk'),
+    path('roles/clone/', clone_role_view, name='role_clone'),
+
+    # Асинхронные версии для ASGI: хеширование паролей в отдельном пуле
+    path('async/register/', aregister_user, name='register_async'),
+    path('async/login/', alogin_user, name='login_async'),
+    path('async/update-profile/', aupdate_profile, name='update_profile_async'),
+    path('async/me/', ame, name='me_async'),
 ]
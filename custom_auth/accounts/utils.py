@@ -1,11 +1,65 @@
+import hashlib
 import secrets
+from contextlib import nullcontext
 from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 def generate_session_key():
     """Генерация уникального ключа сессии"""
     return secrets.token_urlsafe(32)
 
+def session_digest(session_key):
+    """
+    Хеш ключа сессии для хранения и поиска. Ключ случайный (256 бит),
+    поэтому соль и медленный хеш не нужны.
+    """
+    return hashlib.sha256(session_key.encode()).digest()
+
 def get_expiration_time(hours=24):
     """Время окончания сессии"""
     return timezone.now() + timedelta(hours=hours)
+
+
+def create_user(user):
+    """
+    Вставка нового пользователя одним INSERT без предварительного exists():
+    дубликат email (без учёта регистра) отсекает уникальный индекс,
+    поэтому параллельные регистрации не создают второй аккаунт.
+    Возвращает текст ошибки или None.
+    """
+    from .models import Role
+
+    try:
+        with transaction.atomic():
+            user.save(force_insert=True)
+    except IntegrityError:
+        # Причину выясняем только при ошибке: на обычном пути запрос один
+        if user.role_id is not None and not Role.objects.filter(pk=user.role_id).exists():
+            return 'Invalid role ID'
+        return 'Email already registered'
+    return None
+
+
+def record_login(user, ip_address, user_agent, create_session=True):
+    """
+    Записи при входе одной транзакцией: last_login (не чаще раза в
+    LAST_LOGIN_UPDATE_INTERVAL секунд) и новая сессия.
+    """
+    from .models import User
+    from .session_store import get_store
+
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 0))
+    update_last_login = user.last_login is None or now - user.last_login >= interval
+    session = None
+    # Транзакция нужна, только если запросов на запись больше одного
+    atomic = transaction.atomic() if update_last_login and create_session else nullcontext()
+    with atomic:
+        if update_last_login:
+            User.objects.filter(pk=user.pk).update(last_login=now)
+            user.last_login = now
+        if create_session:
+            session = get_store().create(user, ip_address, user_agent)
+    return session
@@ -1,12 +1,27 @@
+from django.conf import settings
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-import json
-
-from .models import User, Role, UserSession
-from .utils import generate_session_key, get_expiration_time
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from . import audit
+from .http import RequestError, json_response, parse_body, parse_query
+from .schemas import (
+    AuditQuery, BulkPermissionsRequest, CloneRoleRequest, LoginRequest, RefreshRequest,
+    RegisterRequest, UpdateProfileRequest,
+)
+from .models import AuthEvent, BusinessElement, User, Role
+from .utils import create_user, record_login
+from .instrumentation import is_enabled as metrics_enabled, phase, registry
+from .snapshot import UserSnapshot
+from .ratelimit import get_limiter, too_many_attempts
+from .session_store import get_store
+from .hashers import check_dummy_password
+from .tokens import REFRESH, TokenError, decode_token, issue_tokens, revoke
+from .permissions import has_permission
+from .permission_editor import apply_to_all, clone_role, mask_from_actions
 from django.utils import timezone
-from accounts.auth_decorators import require_auth
+from accounts.auth_decorators import require_auth, require_permission
 
 @csrf_exempt
 def register_user(request):
@@ -14,47 +29,27 @@ def register_user(request):
         return render(request, 'accounts/register.html')
 
     if request.method != 'POST' and request.method != 'GET':
-        return JsonResponse({'error': 'Only GET and POST methods are allowed'}, status=405)
+        return json_response({'error': 'Only GET and POST methods are allowed'}, status=405)
 
+    # POST через форму или JSON
     try:
-        # POST через форму или JSON
-        if request.content_type == 'application/json':
-            data = json.loads(request.body.decode('utf-8'))
-        else:
-            data = request.POST
-
-        email = data.get('email')
-        password = data.get('password')
-        first_name = data.get('first_name')
-        last_name = data.get('last_name', '')
-        role_id = data.get('role_id')
-
-        if not all([email, password, first_name]):
-            return JsonResponse({'error': 'Missing required fields'}, status=400)
-
-        if User.objects.filter(email=email).exists():
-            return JsonResponse({'error': 'Email already registered'}, status=400)
+        data = parse_body(request, RegisterRequest)
+    except RequestError as e:
+        return e.response()
 
-        user = User(
-            email=email,
-            first_name=first_name,
-            last_name=last_name
-        )
-        user.set_password(password)
+    user = User(
+        email=data.email.strip(),
+        first_name=data.first_name,
+        last_name=data.last_name,
+        role_id=data.role_id,
+    )
+    user.set_password(data.password)
 
-        if role_id:
-            try:
-                role = Role.objects.get(id=role_id)
-                user.role = role
-            except Role.DoesNotExist:
-                return JsonResponse({'error': 'Invalid role ID'}, status=400)
+    error = create_user(user)
+    if error:
+        return json_response({'error': error}, status=400)
 
-        user.save()
-
-        return JsonResponse({'message': 'User registered successfully'}, status=201)
-
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    return json_response({'message': 'User registered successfully'}, status=201)
 
 
 @csrf_exempt
@@ -63,58 +58,69 @@ def login_user(request):
         return render(request, 'accounts/login.html')
 
     if request.method != 'POST' and request.method != 'GET':
-        return JsonResponse({'error': 'Only GET and POST methods are allowed'}, status=405)
+        return json_response({'error': 'Only GET and POST methods are allowed'}, status=405)
 
     try:
-        if request.content_type == 'application/json':
-            data = json.loads(request.body.decode('utf-8'))
-        else:
-            data = request.POST
-
-        email = data.get('email')
-        password = data.get('password')
-
-        if not all([email, password]):
-            return JsonResponse({'error': 'Missing email or password'}, status=400)
+        data = parse_body(request, LoginRequest)
+    except RequestError as e:
+        return e.response()
+    email = data.email
+    password = data.password
+
+    # Отсекаем перебор до поиска пользователя и дорогой проверки пароля
+    limiter = get_limiter()
+    email_key = email.strip().lower()
+    retry_after = limiter.check(request.META.get('REMOTE_ADDR'), email_key)
+    if retry_after:
+        return too_many_attempts(retry_after)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return JsonResponse({'error': 'Invalid credentials'}, status=401)
-
-        if not user.check_password(password):
-            return JsonResponse({'error': 'Invalid credentials'}, status=401)
-
-        if not user.is_active:
-            return JsonResponse({'error': 'User is inactive'}, status=403)
-
-        user.last_login = timezone.now()
-        user.save()
-
-        session_key = generate_session_key()
-        ip_address = request.META.get('REMOTE_ADDR')
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
-
-        session = UserSession.objects.create(
-            user=user,
-            session_key=session_key,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            expires_at=get_expiration_time()
-        )
-
-        return JsonResponse({
+    try:
+        user = User.objects.select_related('role').get(email__lower=email_key)
+    except User.DoesNotExist:
+        # Та же стоимость, что у неверного пароля: время ответа не выдаёт существование email
+        with phase('hashing'):
+            check_dummy_password(password)
+        limiter.failure(email_key)
+        audit.record(AuthEvent.LOGIN_FAILED, request=request, email=email_key)
+        return json_response({'error': 'Invalid credentials'}, status=401)
+
+    if not user.check_password(password):
+        limiter.failure(email_key)
+        audit.record(AuthEvent.LOGIN_FAILED, user, request)
+        return json_response({'error': 'Invalid credentials'}, status=401)
+    limiter.success(email_key)
+
+    if not user.is_active:
+        return json_response({'error': 'User is inactive'}, status=403)
+
+    jwt_mode = settings.AUTH_MODE == 'jwt'
+    session = record_login(
+        user,
+        ip_address=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        create_session=not jwt_mode
+    )
+    audit.record(AuthEvent.LOGIN, user, request)
+
+    user_data = {
+        'id': user.id,
+        'email': user.email,
+        'role': user.role.name if user.role else None
+    }
+
+    if jwt_mode:
+        return json_response({
             'message': 'Login successful',
-            'session_key': session.session_key,
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'role': user.role.name if user.role else None
-            }
+            **issue_tokens(user),
+            'user': user_data
         })
 
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    return json_response({
+        'message': 'Login successful',
+        'session_key': session.session_key,
+        'user': user_data
+    })
+
 
 
 @csrf_exempt
@@ -122,10 +128,41 @@ def login_user(request):
 def logout_user(request):
     if request.method == 'GET':
         return render(request, 'accounts/logout.html')
-    session = request.session_obj
-    session.expires_at = timezone.now()  # делаем сессию неактивной
-    session.save()
-    return JsonResponse({'message': 'Logged out successfully'})
+    payload = request.token_payload
+    if payload is not None:
+        revoke(payload)
+        # Снимок пользователя для JWT не загружаем: всё нужное есть в токене
+        audit.record(AuthEvent.LOGOUT, request=request, user_id=payload['sub'], email=payload['email'])
+        return json_response({'message': 'Logged out successfully'})
+    audit.record(AuthEvent.LOGOUT, request.user, request)
+    get_store().expire(request.session_obj)  # делаем сессию неактивной
+    return json_response({'message': 'Logged out successfully'})
+
+
+@csrf_exempt
+def refresh_token(request):
+    if request.method != 'POST':
+        return json_response({'error': 'Only POST allowed'}, status=405)
+
+    try:
+        data = parse_body(request, RefreshRequest)
+    except RequestError as e:
+        return e.response()
+
+    try:
+        payload = decode_token(data.refresh_token, REFRESH)
+    except TokenError as e:
+        return json_response({'error': str(e)}, status=401)
+
+    # Обновление — редкая операция, здесь можно проверить пользователя в БД
+    try:
+        user = User.objects.select_related('role').get(pk=payload['sub'], is_active=True)
+    except User.DoesNotExist:
+        return json_response({'error': 'Invalid token'}, status=401)
+
+    # Ротация: старый refresh токен больше не принимается
+    revoke(payload)
+    return json_response(issue_tokens(user))
 
 
 @csrf_exempt
@@ -134,21 +171,32 @@ def update_profile(request):
     if request.method == 'GET':
         return render(request, 'accounts/update_profile.html')
     if request.method != 'POST' and request.method != 'GET':
-        return JsonResponse({'error': 'Only POST allowed'}, status=405)
-
-    data = request.POST if request.content_type != 'application/json' else json.loads(request.body.decode('utf-8'))
-
-    user = request.user
-    user.first_name = data.get('first_name', user.first_name)
-    user.last_name = data.get('last_name', user.last_name)
-
-    if data.get('password'):
-        if data.get('password') != data.get('password_repeat'):
-            return JsonResponse({'error': 'Passwords do not match'}, status=400)
-        user.set_password(data['password'])
+        return json_response({'error': 'Only POST allowed'}, status=405)
 
-    user.save()
-    return JsonResponse({'message': 'Profile updated successfully'})
+    try:
+        data = parse_body(request, UpdateProfileRequest)
+    except RequestError as e:
+        return e.response()
+
+    # request.user — неизменяемый снимок, для записи загружаем модель
+    user = User.objects.select_related('role').get(pk=request.user.id)
+    if data.first_name is not None:
+        user.first_name = data.first_name
+    if 'last_name' in data.model_fields_set:
+        user.last_name = data.last_name
+
+    if data.password:
+        if data.password != data.password_repeat:
+            return json_response({'error': 'Passwords do not match'}, status=400)
+        user.set_password(data.password)
+
+    user.save(update_fields=['first_name', 'last_name', 'password_hash'])
+    # Обновляем снимок в кеше текущей сессии и сбрасываем остальные
+    if request.session_obj is not None:
+        request.session_obj.snapshot = UserSnapshot.from_user(user)
+    get_store().refresh_user(user, keep=request.session_obj)
+    audit.record(AuthEvent.PROFILE_UPDATE, user, request)
+    return json_response({'message': 'Profile updated successfully'})
 
 
 @csrf_exempt
@@ -157,14 +205,168 @@ def delete_account(request):
     if request.method == 'GET':
         return render(request, 'accounts/delete_account.html')
     if request.method != 'POST' and request.method != 'GET':
-        return JsonResponse({'error': 'Only POST allowed'}, status=405)
+        return json_response({'error': 'Only POST allowed'}, status=405)
 
     user = request.user
-    user.is_active = False
-    user.save()
+    User.objects.filter(pk=user.id).update(is_active=False)
 
     # Завершаем сессию
-    request.session_obj.expires_at = timezone.now()
-    request.session_obj.save()
+    store = get_store()
+    if request.token_payload is not None:
+        revoke(request.token_payload)
+    else:
+        store.expire(request.session_obj)
+    store.refresh_user(user)
+    audit.record(AuthEvent.DEACTIVATE, user, request)
+
+    return json_response({'message': 'Account deactivated and logged out'})
 
-    return JsonResponse({'message': 'Account deactivated and logged out'})
+
+@require_auth
+def me(request):
+    """Профиль текущего пользователя; повторные запросы с If-None-Match получают 304"""
+    if request.method != 'GET':
+        return json_response({'error': 'Only GET allowed'}, status=405)
+
+    snapshot = request.user
+    etag = snapshot.etag
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+@require_auth
+def list_sessions(request):
+    """Активные сессии текущего пользователя"""
+    if request.method != 'GET':
+        return json_response({'error': 'Only GET allowed'}, status=405)
+
+    current = request.session_obj.key_id if request.session_obj is not None else None
+    sessions = [
+        {
+            'id': session.key_id,
+            'ip_address': session.ip_address,
+            'user_agent': session.user_agent,
+            'created_at': session.created_at,
+            'expires_at': session.expires_at,
+            'current': session.key_id == current,
+        }
+        for session in get_store().list_sessions(request.user)
+    ]
+    return json_response({'sessions': sessions})
+
+
+@csrf_exempt
+@require_auth
+def revoke_session(request, session_id):
+    """Завершение одной сессии текущего пользователя"""
+    if request.method != 'POST':
+        return json_response({'error': 'Only POST allowed'}, status=405)
+    if not get_store().revoke(request.user, session_id):
+        return json_response({'error': 'Session not found'}, status=404)
+    return json_response({'message': 'Session revoked'})
+
+
+@csrf_exempt
+@require_auth
+def revoke_other_sessions(request):
+    """Выход на всех устройствах, кроме текущего"""
+    if request.method != 'POST':
+        return json_response({'error': 'Only POST allowed'}, status=405)
+    count = get_store().revoke_others(request.user, keep=request.session_obj)
+    return json_response({'message': 'Other sessions revoked', 'revoked': count})
+
+
+@require_auth
+def audit_events(request):
+    """
+    События журнала, новые первыми. По умолчанию — свои;
+    чужие (user_id) — с правом чтения элемента audit_log.
+    Следующая страница — until=<created_at последнего события>.
+    """
+    if request.method != 'GET':
+        return json_response({'error': 'Only GET allowed'}, status=405)
+    try:
+        query = parse_query(request, AuditQuery)
+    except RequestError as e:
+        return e.response()
+
+    user_id = query.user_id if query.user_id is not None else request.user.id
+    if user_id != request.user.id and not has_permission(request.user, 'audit_log', 'read'):
+        return json_response({'error': 'Permission denied'}, status=403)
+
+    events = audit.query_events(
+        user_id, kinds=[query.kind] if query.kind else None,
+        since=query.since, until=query.until, limit=query.limit,
+    )
+    return json_response({'events': [
+        {
+            'kind': event.kind,
+            'email': event.email,
+            'ip_address': event.ip_address,
+            'user_agent': event.user_agent,
+            'created_at': event.created_at,
+        }
+        for event in events
+    ]})
+
+
+def metrics(request):
+    """Агрегированные метрики аутентификации в формате Prometheus"""
+    if not metrics_enabled():
+        return json_response({'error': 'Metrics are disabled'}, status=404)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
+
+
+@csrf_exempt
+@require_auth
+@require_permission('access_rule', 'update')
+def bulk_permissions(request):
+    """
+    Массовое изменение прав: действия actions для всех сочетаний roles x elements.
+    mode: set — заменить права, grant — добавить, revoke — снять.
+    """
+    if request.method != 'POST':
+        return json_response({'error': 'Only POST allowed'}, status=405)
+    try:
+        data = parse_body(request, BulkPermissionsRequest)
+    except RequestError as e:
+        return e.response()
+
+    roles, elements = data.roles, data.elements
+    mask = mask_from_actions(data.actions)
+    role_ids = dict(Role.objects.filter(name__in=roles).values_list('name', 'id'))
+    element_ids = dict(BusinessElement.objects.filter(name__in=elements).values_list('name', 'id'))
+    unknown = sorted(set(roles) - set(role_ids)) + sorted(set(elements) - set(element_ids))
+    if unknown:
+        return json_response({'error': 'Unknown roles or elements', 'unknown': unknown}, status=400)
+
+    saved, deleted = apply_to_all(role_ids.values(), element_ids.values(), mask, data.mode)
+    return json_response({'message': 'Permissions updated', 'saved': saved, 'deleted': deleted})
+
+
+@csrf_exempt
+@require_auth
+@require_permission('access_rule', 'create')
+def clone_role_view(request):
+    """Копия роли со всеми правилами доступа"""
+    if request.method != 'POST':
+        return json_response({'error': 'Only POST allowed'}, status=405)
+    try:
+        data = parse_body(request, CloneRoleRequest)
+    except RequestError as e:
+        return e.response()
+
+    name = data.name
+    try:
+        source = Role.objects.get(name=data.source)
+    except Role.DoesNotExist:
+        return json_response({'error': 'Invalid source role'}, status=400)
+    if Role.objects.filter(name=name).exists():
+        return json_response({'error': 'Role already exists'}, status=400)
+
+    role = clone_role(source, name, data.description)
+    return json_response({'message': 'Role cloned', 'id': role.id, 'name': role.name}, status=201)
@@ -0,0 +1,128 @@
+"""
+require_auth и require_permission для async view: одинаковое поведение
+с синхронными view и проверка сессии без пула потоков при попадании в кеш.
+"""
+import asyncio
+
+import pytest
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+
+from accounts import permissions, session_store
+from accounts.auth_decorators import require_auth, require_permission
+from accounts.models import AccessRoleRule, BusinessElement, User
+from accounts.permissions import get_matrix
+from accounts.snapshot import UserSnapshot
+from accounts.tokens import decode_token, issue_tokens, revoke
+from accounts.utils import record_login
+
+from .conftest import BENCH_CONCURRENCY, BENCH_REQUESTS
+from .factories import RoleFactory, UserFactory
+from .load import run_async_load
+
+
+@pytest.fixture(params=('db', 'cache', 'hybrid'))
+def user(request, settings, transactional_db):
+    settings.SESSION_STORE = {'BACKEND': request.param, 'FLUSH_INTERVAL': 3600}
+    user = UserFactory(role=RoleFactory(name='user'))
+    yield User.objects.select_related('role').get(pk=user.pk)
+    session_store.get_store().flush()
+
+
+def _get(path, authorization):
+    async def request():
+        return await AsyncClient().get(path, headers={'Authorization': authorization})
+
+    return asyncio.run(request())
+
+
+def test_async_session_auth(user):
+    key = record_login(user, '127.0.0.1', 'bench').session_key
+    response = _get('/api/async/me/', f'Session {key}')
+    assert response.status_code == 200
+    assert response.json()['email'] == user.email
+
+    assert _get('/api/async/me/', f'Session {key}').status_code == 200  # Из кеша
+    assert _get('/api/async/me/', 'Session missing').status_code == 401
+    assert _get('/api/async/me/', 'Basic abc').status_code == 401
+
+    session_store.get_store().expire(session_store.get_store().get(key))
+    assert _get('/api/async/me/', f'Session {key}').status_code == 401
+
+
+def test_async_token_auth(user):
+    access = issue_tokens(user)['access_token']
+    response = _get('/api/async/me/', f'Bearer {access}')
+    assert response.status_code == 200
+    assert response.json()['id'] == user.id
+
+    revoke(decode_token(access))
+    assert _get('/api/async/me/', f'Bearer {access}').json() == {'error': 'Token revoked'}
+    assert _get('/api/async/me/', 'Bearer broken').status_code == 401
+
+
+def test_async_hot_path_without_threads(user, monkeypatch):
+    key = record_login(user, '127.0.0.1', 'bench').session_key
+    get_matrix()
+    assert _get('/api/async/me/', f'Session {key}').status_code == 200  # Прогрев кешей
+
+    def forbidden(func):
+        raise AssertionError(f'sync_to_async({func.__name__}) on the hot path')
+
+    for module in (session_store, permissions):
+        monkeypatch.setattr(module, 'sync_to_async', forbidden)
+    assert _get('/api/async/me/', f'Session {key}').status_code == 200
+
+
+@pytest.mark.parametrize('is_async', (False, True))
+def test_require_permission(transactional_db, is_async):
+    role = RoleFactory(name='editor')
+    element = BusinessElement.objects.create(name='post')
+    AccessRoleRule.objects.create(role=role, element=element, read_permission=True)
+    get_matrix().load()
+    user = UserSnapshot.from_user(UserFactory(role=role))
+
+    if is_async:
+        async def view(request):
+            return HttpResponse('ok')
+    else:
+        def view(request):
+            return HttpResponse('ok')
+
+    def call(action):
+        request = RequestFactory().get('/')
+        request.user = user
+        response = require_permission('post', action)(view)(request)
+        return asyncio.run(response) if is_async else response
+
+    assert call('read').status_code == 200
+    assert call('update').status_code == 403
+
+
+def test_require_auth_keeps_view_kind():
+    async def async_view(request):
+        pass
+
+    def sync_view(request):
+        pass
+
+    assert asyncio.iscoroutinefunction(require_auth(async_view))
+    assert asyncio.iscoroutinefunction(require_permission('post', 'read')(async_view))
+    assert not asyncio.iscoroutinefunction(require_auth(sync_view))
+    assert require_auth(sync_view).__name__ == 'sync_view'
+
+
+def bench_async_me(seed, report):
+    keys = [
+        record_login(user, '127.0.0.1', 'bench').session_key
+        for user in User.objects.select_related('role')[:BENCH_CONCURRENCY * 2]
+    ]
+    client = AsyncClient()
+
+    async def me(i):
+        response = await client.get('/api/async/me/', headers={'Authorization': f'Session {keys[i % len(keys)]}'})
+        return response.status_code == 200
+
+    stats = asyncio.run(run_async_load(me, BENCH_REQUESTS, BENCH_CONCURRENCY))
+    report.add('me', 'asgi', stats)
+    assert stats['errors'] == 0
@@ -0,0 +1,166 @@
+"""
+Журнал событий аутентификации: события из view, фоновая запись пачками,
+политики переполнения буфера и стоимость записи события на горячем пути.
+"""
+import json
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts import audit
+from accounts.audit import AuditBuffer
+from accounts.models import AccessRoleRule, AuthEvent, BusinessElement
+from accounts.permissions import get_matrix
+
+from .factories import PASSWORD, RoleFactory, UserFactory
+from .load import summarize
+
+ITERATIONS = 20000
+
+
+@pytest.fixture
+def audit_log(settings, transactional_db):
+    """Без фоновой записи по таймеру: события пишутся явным audit.flush()"""
+    settings.AUDIT_LOG = {'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': 1000}
+    yield settings
+    audit.reset()
+
+
+def _login(client, email, password=PASSWORD):
+    return client.post(
+        '/api/login/', json.dumps({'email': email, 'password': password}),
+        content_type='application/json', HTTP_USER_AGENT='bench',
+    )
+
+
+def _wait_written(count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while audit.get_stats().get('written', 0) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return audit.get_stats()['written']
+
+
+def test_view_events(client, audit_log):
+    user = UserFactory()
+    assert _login(client, user.email, 'wrong').status_code == 401
+    assert _login(client, 'nobody@example.com').status_code == 401
+    key = _login(client, user.email).json()['session_key']
+    client.post('/api/logout/', HTTP_AUTHORIZATION=f'Session {key}')
+    assert not AuthEvent.objects.exists()  # Только буфер, без записи в БД
+
+    assert audit.flush() == 4
+    events = list(audit.query_events(user))
+    assert [event.kind for event in events] == ['logout', 'login', 'login_failed']
+    assert events[1].user_agent == 'bench'
+    failed = audit.query_events(kinds=['login_failed'])
+    assert [(event.user_id, event.email) for event in failed] == [
+        (None, 'nobody@example.com'), (user.id, user.email),
+    ]
+
+
+def test_no_queries_on_record(client, audit_log):
+    user = UserFactory()
+    _login(client, user.email)
+    with CaptureQueriesContext(connection) as enabled:
+        _login(client, user.email)
+    audit_log.AUDIT_LOG = {'ENABLED': False}
+    with CaptureQueriesContext(connection) as disabled:
+        _login(client, user.email)
+    assert len(enabled) == len(disabled)
+
+
+def test_flush_by_batch_size(audit_log):
+    audit_log.AUDIT_LOG = {'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': 10}
+    user = UserFactory()
+    for _ in range(10):
+        audit.record(AuthEvent.LOGIN, user)
+    assert _wait_written(10) == 10
+    assert audit.query_events(user).count() == 10
+
+
+def test_flush_by_interval(audit_log):
+    audit_log.AUDIT_LOG = {'FLUSH_INTERVAL_MS': 20, 'BATCH_SIZE': 1000}
+    user = UserFactory()
+    audit.record(AuthEvent.LOGIN, user)
+    assert _wait_written(1) == 1
+
+
+def test_overflow_drop(audit_log, monkeypatch):
+    audit_log.AUDIT_LOG = {'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': 5, 'MAX_PENDING': 5}
+    monkeypatch.setattr(AuditBuffer, '_start', lambda self: None)  # Поток записи не успевает
+    results = [audit.record(AuthEvent.LOGIN_FAILED, email='x@example.com') for _ in range(8)]
+    assert results == [True] * 5 + [False] * 3
+    assert audit.get_stats()['dropped'] == 3
+    assert audit.flush() == 5
+
+
+def test_overflow_block(audit_log):
+    audit_log.AUDIT_LOG = {
+        'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': 5, 'MAX_PENDING': 5, 'OVERFLOW': 'block',
+    }
+    assert all(audit.record(AuthEvent.LOGIN_FAILED, email='x@example.com') for _ in range(20))
+    audit.flush()
+    assert audit.get_stats()['dropped'] == 0
+    assert AuthEvent.objects.count() == 20
+
+
+def test_async_record_does_not_block(audit_log, monkeypatch):
+    audit_log.AUDIT_LOG = {'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': 1, 'MAX_PENDING': 1, 'OVERFLOW': 'block'}
+    monkeypatch.setattr(AuditBuffer, '_start', lambda self: None)
+    assert audit.record(AuthEvent.LOGIN_FAILED, email='x@example.com', block=False)
+    assert not audit.record(AuthEvent.LOGIN_FAILED, email='x@example.com', block=False)
+    assert audit.get_stats()['dropped'] == 1
+
+
+def test_buffer_config_validation():
+    with pytest.raises(ValueError):
+        AuditBuffer(batch_size=100, flush_interval=1, max_pending=10, overflow='drop')
+    with pytest.raises(ValueError):
+        AuditBuffer(batch_size=1, flush_interval=1, max_pending=10, overflow='retry')
+
+
+def test_audit_api(client, audit_log):
+    role = RoleFactory(name='auditor')
+    auditor, other = UserFactory(role=role), UserFactory()
+    for user in (auditor, other):
+        _login(client, user.email)
+    _login(client, other.email, 'wrong')
+    audit.flush()
+    key = _login(client, auditor.email).json()['session_key']
+    headers = {'HTTP_AUTHORIZATION': f'Session {key}'}
+
+    events = client.get('/api/audit/', **headers).json()['events']
+    assert [event['kind'] for event in events] == ['login']
+    assert client.get(f'/api/audit/?user_id={other.id}', **headers).status_code == 403
+    assert client.get('/api/audit/?kind=unknown', **headers).json()['error'] == 'Invalid event kind'
+
+    AccessRoleRule.objects.create(
+        role=role, element=BusinessElement.objects.create(name='audit_log'), read_permission=True,
+    )
+    get_matrix().load()
+    response = client.get(f'/api/audit/?user_id={other.id}&kind=login_failed', **headers)
+    assert [event['kind'] for event in response.json()['events']] == ['login_failed']
+    assert len(client.get(f'/api/audit/?user_id={other.id}&limit=1', **headers).json()['events']) == 1
+
+
+def bench_audit_record(audit_log, report):
+    # Порог пачки выше числа событий: поток записи не забирает их до явного flush()
+    audit_log.AUDIT_LOG = {
+        'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': ITERATIONS + 1, 'MAX_PENDING': ITERATIONS + 1,
+    }
+    user = UserFactory()
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        audit.record(AuthEvent.LOGIN, user)
+    elapsed = time.perf_counter() - start
+    report.add('audit_record', 'buffer', {'per_call_us': elapsed / ITERATIONS * 1e6})
+
+    start = time.perf_counter()
+    audit.flush()
+    elapsed = time.perf_counter() - start
+    written = audit.get_stats()['written']
+    assert written == ITERATIONS
+    report.add('audit_flush', 'bulk_create', summarize([elapsed], elapsed, 0), rows=written)
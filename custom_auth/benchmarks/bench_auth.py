@@ -0,0 +1,142 @@
+"""
+Сценарии нагрузки на эндпоинты аутентификации.
+Запуск: pytest benchmarks/bench_auth.py -s
+"""
+import asyncio
+import itertools
+import json
+import random
+import threading
+
+import pytest
+import requests
+from django.test import AsyncClient, Client
+
+from .conftest import BENCH_CONCURRENCY, BENCH_REQUESTS
+from .factories import PASSWORD
+from .load import run_async_load, run_load
+
+TRANSPORTS = ('client', 'wsgi')
+_register_counter = itertools.count()
+
+
+class Transport:
+    """
+    Единый интерфейс для тестового клиента Django и живого WSGI-сервера.
+    Клиенты создаются по одному на поток.
+    """
+
+    def __init__(self, kind, live_server=None):
+        self.kind = kind
+        self.base_url = live_server.url if live_server else ''
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = Client() if self.kind == 'client' else requests.Session()
+            self._local.client = client
+        return client
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f'Session {token}'} if token else {}
+        body = json.dumps(data) if data is not None else None
+        client = self._client()
+        if self.kind == 'client':
+            extra = {'HTTP_AUTHORIZATION': headers['Authorization']} if token else {}
+            call = getattr(client, method.lower())
+            if body is None:
+                return call(path, **extra).status_code
+            return call(path, body, content_type='application/json', **extra).status_code
+        headers['Content-Type'] = 'application/json'
+        return client.request(method, self.base_url + path, data=body, headers=headers).status_code
+
+
+@pytest.fixture(params=TRANSPORTS)
+def transport(request):
+    if request.param == 'wsgi':
+        return Transport('wsgi', request.getfixturevalue('live_server'))
+    request.getfixturevalue('transactional_db')
+    return Transport('client')
+
+
+def bench_login(seed, transport, report):
+    users = seed['users']
+
+    def login(i):
+        user = users[i % len(users)]
+        return transport.request(
+            'POST', '/api/login/', {'email': user.email, 'password': PASSWORD}
+        ) == 200
+
+    stats = run_load(login, BENCH_REQUESTS, BENCH_CONCURRENCY)
+    report.add('login', transport.kind, stats)
+    assert stats['errors'] == 0
+
+
+def bench_protected_endpoint(seed, transport, report):
+    keys = [session.session_key for session in seed['sessions']]
+
+    def protected(i):
+        return transport.request('GET', '/api/update-profile/', token=random.choice(keys)) == 200
+
+    stats = run_load(protected, BENCH_REQUESTS, BENCH_CONCURRENCY)
+    report.add('require_auth', transport.kind, stats)
+    assert stats['errors'] == 0
+
+
+def bench_register(seed, transport, report):
+    def register(i):
+        n = next(_register_counter)
+        return transport.request('POST', '/api/register/', {
+            'email': f'new{n}@example.com', 'password': PASSWORD, 'first_name': 'New',
+        }) == 201
+
+    stats = run_load(register, BENCH_REQUESTS, BENCH_CONCURRENCY)
+    report.add('register', transport.kind, stats)
+    assert stats['errors'] == 0
+
+
+def bench_logout(seed, transport, report):
+    keys = [session.session_key for session in seed['sessions']]
+    total = min(BENCH_REQUESTS, len(keys))
+
+    def logout(i):
+        return transport.request('POST', '/api/logout/', token=keys[i]) == 200
+
+    stats = run_load(logout, total, BENCH_CONCURRENCY)
+    report.add('logout', transport.kind, stats)
+    assert stats['errors'] == 0
+
+
+def bench_login_asgi(seed, report):
+    users = seed['users']
+    client = AsyncClient()
+
+    async def login(i):
+        user = users[i % len(users)]
+        response = await client.post(
+            '/api/async/login/',
+            json.dumps({'email': user.email, 'password': PASSWORD}),
+            content_type='application/json',
+        )
+        return response.status_code == 200
+
+    stats = asyncio.run(run_async_load(login, BENCH_REQUESTS, BENCH_CONCURRENCY))
+    report.add('login', 'asgi', stats)
+    assert stats['errors'] == 0
+
+
+def bench_protected_endpoint_asgi(seed, report):
+    keys = [session.session_key for session in seed['sessions']]
+    client = AsyncClient()
+
+    async def protected(i):
+        response = await client.get(
+            '/api/async/update-profile/', headers={'Authorization': f'Session {random.choice(keys)}'}
+        )
+        return response.status_code == 200
+
+    stats = asyncio.run(run_async_load(protected, BENCH_REQUESTS, BENCH_CONCURRENCY))
+    report.add('require_auth', 'asgi', stats)
+    assert stats['errors'] == 0
@@ -0,0 +1,88 @@
+"""
+Накладные расходы разбора запроса и сериализации ответа на один вызов:
+прежний путь (json.loads(body.decode()) + JsonResponse) против accounts.http
+со стандартным json и с orjson.
+"""
+import json
+import time
+
+import pytest
+from django.http import JsonResponse
+from django.test import RequestFactory
+
+from accounts import http
+from accounts.http import RequestError, json_response, parse_body
+from accounts.schemas import LoginRequest, RegisterRequest
+
+from .conftest import BENCH_REQUESTS
+from .load import summarize
+
+LOGIN = {'email': 'user@example.com', 'password': 'secret-password'}
+RESPONSE = {
+    'message': 'Login successful',
+    'session_key': 'x' * 43,
+    'user': {'id': 1, 'email': 'user@example.com', 'role': 'user'},
+}
+
+
+def _request(payload):
+    return RequestFactory().post('/api/login/', json.dumps(payload), content_type='application/json')
+
+
+def _before(request):
+    data = json.loads(request.body.decode('utf-8'))
+    if not all([data.get('email'), data.get('password')]):
+        return JsonResponse({'error': 'Missing email or password'}, status=400)
+    return JsonResponse(RESPONSE)
+
+
+def _after(request):
+    try:
+        parse_body(request, LoginRequest)
+    except RequestError as e:
+        return e.response()
+    return json_response(RESPONSE)
+
+
+def _time(fn):
+    request = _request(LOGIN)
+    request.body  # Тело читается один раз, как в настоящем запросе
+    timings = []
+    for _ in range(BENCH_REQUESTS * 10):
+        start = time.perf_counter()
+        fn(request)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings, sum(timings), 0)
+
+
+@pytest.mark.parametrize('fast', [False, True], ids=['json', 'orjson'])
+def bench_parse_serialize(fast, settings, report):
+    if fast and http.orjson is None:
+        pytest.skip('orjson is not installed')
+    settings.JSON_API = {'FAST_ENCODER': fast}
+    report.add('json_parse_serialize', 'before', _time(_before))
+    report.add('json_parse_serialize', f'after_{"orjson" if fast else "json"}', _time(_after))
+
+
+@pytest.mark.parametrize('fast', [False, True], ids=['json', 'orjson'])
+def test_same_output(fast, settings):
+    if fast and http.orjson is None:
+        pytest.skip('orjson is not installed')
+    settings.JSON_API = {'FAST_ENCODER': fast}
+    assert json.loads(_after(_request(LOGIN)).content) == json.loads(_before(_request(LOGIN)).content)
+
+
+def test_body_limits(settings):
+    settings.JSON_API = {'MAX_BODY_SIZE': 100}
+    with pytest.raises(RequestError) as error:
+        parse_body(_request({'email': 'a@b.c', 'password': 'x' * 200}), LoginRequest)
+    assert error.value.status == 413
+
+    with pytest.raises(RequestError) as error:
+        parse_body(RequestFactory().post('/', b'[1, 2]', content_type='application/json'), LoginRequest)
+    assert error.value.message == 'Invalid JSON'
+
+    with pytest.raises(RequestError) as error:
+        parse_body(_request({'email': 'a@b.c'}), RegisterRequest)
+    assert error.value.message == 'Missing required fields'
+    assert error.value.details[0]['field'] in ('password', 'first_name')
@@ -0,0 +1,56 @@
+"""
+Регрессионная проверка числа SQL-запросов на один вход.
+BEGIN/COMMIT не учитываются: одни драйверы их логируют, другие нет.
+"""
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Role, User
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+@pytest.fixture
+def user(transactional_db, settings):
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    settings.LAST_LOGIN_UPDATE_INTERVAL = 60
+    user = User(email='login@example.com', first_name='Login', role=Role.objects.create(name='user'))
+    user.set_password('secret')
+    user.save()
+    return user
+
+
+def _login(client):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(
+            '/api/login/',
+            json.dumps({'email': 'login@example.com', 'password': 'secret'}),
+            content_type='application/json',
+        )
+    assert response.status_code == 200
+    statements = [
+        q['sql'] for q in queries.captured_queries
+        if not q['sql'].startswith(TRANSACTION_STATEMENTS)
+    ]
+    return response, statements
+
+
+def test_login_queries(client, user):
+    # SELECT пользователя вместе с ролью, UPDATE last_login, INSERT сессии
+    response, statements = _login(client)
+    assert len(statements) == 3, statements
+    assert response.json()['user']['role'] == 'user'
+
+    # Повторный вход в пределах LAST_LOGIN_UPDATE_INTERVAL не пишет last_login
+    _, statements = _login(client)
+    assert len(statements) == 2, statements
+
+
+def test_login_queries_jwt(client, user, settings):
+    settings.AUTH_MODE = 'jwt'
+    response, statements = _login(client)
+    assert len(statements) == 2, statements
+    assert 'access_token' in response.json()
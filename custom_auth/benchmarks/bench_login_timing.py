@@ -0,0 +1,112 @@
+"""
+Статистическая проверка защиты от перебора email: время ответа на вход
+с несуществующим email и с неверным паролем должно быть неразличимо.
+
+Используется настоящий PBKDF2 с уменьшенным числом итераций, чтобы стоимость
+хеширования, как и в продакшене, была основной частью ответа. Распределения
+сравниваются двухвыборочным критерием Колмогорова-Смирнова.
+"""
+import json
+import math
+import os
+import time
+
+import pytest
+
+from accounts import views
+from accounts.models import User
+
+from .load import summarize
+
+SAMPLES = int(os.environ.get('BENCH_TIMING_SAMPLES', 40))
+# Критическое значение c(alpha) критерия Колмогорова-Смирнова для alpha = 0.001
+KS_C_ALPHA = 1.95
+
+
+@pytest.fixture
+def pbkdf2(settings, transactional_db):
+    settings.PASSWORD_HASHERS = ['accounts.hashers.TunedPBKDF2PasswordHasher']
+    settings.PASSWORD_HASH_ITERATIONS = 20000
+    user = User(email='exists@example.com', first_name='Timing')
+    user.set_password('correct-password')
+    user.save()
+    return user
+
+
+def ks_statistic(a, b):
+    """Максимальное расстояние между эмпирическими функциями распределения"""
+    a, b = sorted(a), sorted(b)
+    i = j = 0
+    distance = 0.0
+    while i < len(a) and j < len(b):
+        if a[i] <= b[j]:
+            i += 1
+        else:
+            j += 1
+        distance = max(distance, abs(i / len(a) - j / len(b)))
+    return distance
+
+
+def ks_critical(n, m):
+    return KS_C_ALPHA * math.sqrt((n + m) / (n * m))
+
+
+def _measure(client):
+    timings = {'missing': [], 'wrong_password': []}
+    emails = {'missing': 'nobody@example.com', 'wrong_password': 'exists@example.com'}
+
+    def login(email):
+        start = time.perf_counter()
+        response = client.post(
+            '/api/login/', json.dumps({'email': email, 'password': 'bad-password'}),
+            content_type='application/json',
+        )
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 401
+        assert response.json() == {'error': 'Invalid credentials'}
+        return elapsed
+
+    # Прогрев: фиктивный хеш считается при первом обращении
+    for email in emails.values():
+        login(email)
+    # Чередуем сценарии, чтобы дрейф нагрузки на машине влиял на оба одинаково
+    for _ in range(SAMPLES):
+        for kind, email in emails.items():
+            timings[kind].append(login(email))
+    return timings
+
+
+def bench_login_timing_equalized(client, pbkdf2, report):
+    timings = _measure(client)
+    missing, wrong = timings['missing'], timings['wrong_password']
+    for kind, values in timings.items():
+        report.add('login_timing', kind, summarize(values, sum(values), 0))
+
+    distance = ks_statistic(missing, wrong)
+    assert distance < ks_critical(len(missing), len(wrong)), distance
+
+
+def bench_login_timing_detects_leak(client, pbkdf2, monkeypatch):
+    """Без фиктивной проверки тот же критерий различает сценарии — тест чувствителен к утечке"""
+    monkeypatch.setattr(views, 'check_dummy_password', lambda password: False)
+    timings = _measure(client)
+    missing, wrong = timings['missing'], timings['wrong_password']
+    assert ks_statistic(missing, wrong) >= ks_critical(len(missing), len(wrong))
+
+
+def test_dummy_hashing_bounded_by_rate_limit(client, transactional_db, settings, monkeypatch):
+    """Под перебором фиктивная проверка выполняется не больше FAILURES_PER_EMAIL раз на email"""
+    settings.RATE_LIMIT = {'ENABLED': True, 'LOGIN_PER_IP': (1000, 60), 'FAILURES_PER_EMAIL': (3, 300)}
+    calls = []
+    check = views.check_dummy_password
+    monkeypatch.setattr(views, 'check_dummy_password', lambda password: calls.append(1) or check(password))
+
+    statuses = [
+        client.post(
+            '/api/login/', json.dumps({'email': 'nobody@example.com', 'password': 'guess'}),
+            content_type='application/json',
+        ).status_code
+        for _ in range(10)
+    ]
+    assert statuses == [401] * 3 + [429] * 7
+    assert len(calls) == 3
@@ -0,0 +1,101 @@
+"""
+Массовое редактирование прав: число запросов не зависит от числа правил,
+матрица прав перечитывается один раз на операцию.
+"""
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import AccessRoleRule
+from accounts.permission_editor import GRANT, REVOKE, SET, apply_to_all, clone_role
+from accounts.permissions import CREATE, DELETE, READ, UPDATE, _matrix, get_matrix
+from accounts.utils import record_login
+
+from .factories import AccessRoleRuleFactory, BusinessElementFactory, RoleFactory, UserFactory
+
+
+@pytest.fixture
+def reloads(monkeypatch):
+    calls = []
+    load = type(_matrix).load
+    monkeypatch.setattr(type(_matrix), 'load', lambda self: calls.append(1) or load(self))
+    return calls
+
+
+def _ids(objects):
+    return [obj.pk for obj in objects]
+
+
+def test_bulk_apply_constant_queries(seed, reloads, django_capture_on_commit_callbacks):
+    get_matrix()
+    reloads.clear()
+    roles, elements = _ids(seed['roles']), _ids(seed['elements'])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with CaptureQueriesContext(connection) as small:
+            apply_to_all(roles[:1], elements[:2], READ | UPDATE, SET)
+    with django_capture_on_commit_callbacks(execute=True):
+        with CaptureQueriesContext(connection) as large:
+            apply_to_all(roles, elements, READ | UPDATE, SET)
+
+    assert len(large) == len(small)
+    # Одна перезагрузка матрицы на операцию, без построчных обработчиков
+    assert len(reloads) == 2
+    assert all(_matrix.mask(role, element.name) == READ | UPDATE
+               for role in roles for element in seed['elements'])
+
+
+def test_grant_revoke(transactional_db, django_capture_on_commit_callbacks):
+    role = RoleFactory()
+    kept, cleared = BusinessElementFactory(), BusinessElementFactory()
+    AccessRoleRuleFactory(role=role, element=kept, read_permission=True,
+                          create_permission=False, update_permission=False)
+    AccessRoleRuleFactory(role=role, element=cleared, read_permission=True,
+                          create_permission=False, update_permission=False)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        saved, deleted = apply_to_all([role.pk], [kept.pk], CREATE | DELETE, GRANT)
+    assert (saved, deleted) == (1, 0)
+    rule = AccessRoleRule.objects.get(role=role, element=kept)
+    assert (rule.read_permission, rule.create_permission, rule.delete_permission) == (True, True, True)
+
+    saved, deleted = apply_to_all([role.pk], [kept.pk, cleared.pk], READ, REVOKE)
+    assert (saved, deleted) == (1, 1)
+    assert list(AccessRoleRule.objects.filter(role=role).values_list('element_id', flat=True)) == [kept.pk]
+
+
+def test_clone_role(seed):
+    source = seed['roles'][0]
+    clone = clone_role(source, 'auditor')
+    copied = set(AccessRoleRule.objects.filter(role=clone).values_list(
+        'element_id', 'read_permission', 'create_permission', 'update_permission', 'delete_permission'))
+    original = set(AccessRoleRule.objects.filter(role=source).values_list(
+        'element_id', 'read_permission', 'create_permission', 'update_permission', 'delete_permission'))
+    assert copied == original and len(copied) == len(seed['elements'])
+
+
+def test_bulk_api(client, transactional_db, django_capture_on_commit_callbacks):
+    admin_role = RoleFactory(name='admin')
+    rules = BusinessElementFactory(name='access_rule')
+    AccessRoleRuleFactory(role=admin_role, element=rules, read_permission=True,
+                          create_permission=True, update_permission=True)
+    target = RoleFactory(name='viewer')
+    elements = [BusinessElementFactory() for _ in range(3)]
+    session = record_login(UserFactory(role=admin_role), '127.0.0.1', 'bench')
+    headers = {'HTTP_AUTHORIZATION': f'Session {session.session_key}'}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/api/permissions/bulk/', json.dumps({
+            'mode': 'grant', 'roles': ['viewer'],
+            'elements': [element.name for element in elements], 'actions': ['read'],
+        }), content_type='application/json', **headers)
+    assert response.status_code == 200, response.content
+    assert response.json()['saved'] == 3
+    assert get_matrix().mask(target.pk, elements[0].name) == READ
+
+    response = client.post('/api/roles/clone/', json.dumps({'source': 'viewer', 'name': 'viewer2'}),
+                           content_type='application/json', **headers)
+    assert response.status_code == 201
+    assert AccessRoleRule.objects.filter(role__name='viewer2').count() == 3
@@ -0,0 +1,220 @@
+"""
+Микробенчмарк проверки прав по скомпилированной матрице.
+Запуск: pytest benchmarks/bench_permissions.py -s
+"""
+import time
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import AccessRoleRule, AuthEvent, BusinessElement, Role, User
+from accounts.permissions import (
+    ALL, OWN, PermissionMatrix, get_matrix, get_scope, has_permission, scope_queryset,
+)
+
+ROLES = 20
+ELEMENTS = 100
+ITERATIONS = 200_000
+DEPTH = 200
+ROWS = 5000
+
+
+@pytest.fixture
+def user(db):
+    roles = Role.objects.bulk_create([Role(name=f'role{i}') for i in range(ROLES)])
+    elements = BusinessElement.objects.bulk_create(
+        [BusinessElement(name=f'element{i}') for i in range(ELEMENTS)]
+    )
+    AccessRoleRule.objects.bulk_create([
+        AccessRoleRule(
+            role=role, element=element,
+            read_permission=True, update_permission=bool(element.pk % 2),
+        )
+        for role in roles for element in elements
+    ])
+    get_matrix().load()
+    return User.objects.create(email='bench@example.com', first_name='Bench', role=roles[0])
+
+
+def bench_has_permission(user, report):
+    assert has_permission(user, 'element1', 'read')
+    assert not has_permission(user, 'element1', 'delete')
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        has_permission(user, 'element42', 'update')
+    per_check = (time.perf_counter() - start) / ITERATIONS
+
+    # Базовая линия: один поиск в словаре на этом же железе
+    lookup = {'element42': 4}.get
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        lookup('element42')
+    per_lookup = (time.perf_counter() - start) / ITERATIONS
+
+    report.add('has_permission', 'in-process', {
+        'ns_per_check': round(per_check * 1e9), 'dict_get_ns': round(per_lookup * 1e9),
+    })
+    # Абсолютное время зависит от машины и её загрузки, поэтому только отчёт.
+    # Грубая граница ловит регрессии вроде запроса в БД (в тысячи раз дольше dict.get)
+    assert per_check < 200 * per_lookup
+
+
+def bench_incremental_update(user):
+    element = BusinessElement.objects.get(name='element3')
+    assert not has_permission(user, 'element3', 'delete')
+    AccessRoleRule.objects.filter(role=user.role, element=element).delete()
+    assert not has_permission(user, 'element3', 'read')
+    AccessRoleRule.objects.create(role=user.role, element=element, delete_permission=True)
+    assert has_permission(user, 'element3', 'delete')
+    element.name = 'renamed'
+    element.save()
+    assert has_permission(user, 'renamed', 'delete')
+
+
+def _fresh_masks():
+    matrix = PermissionMatrix()
+    matrix.load()
+    return matrix._masks
+
+
+def test_role_inheritance(db):
+    post, comment = (BusinessElement.objects.create(name=name) for name in ('post', 'comment'))
+    base = Role.objects.create(name='user')
+    moderator = Role.objects.create(name='moderator', parent=base)
+    admin = Role.objects.create(name='admin', parent=moderator)
+    AccessRoleRule.objects.create(role=base, element=post, read_permission=True)
+    AccessRoleRule.objects.create(role=moderator, element=post, update_permission=True)
+    get_matrix().load()
+    user = User.objects.create(email='admin@example.com', first_name='Admin', role=admin)
+
+    assert has_permission(user, 'post', 'read') and has_permission(user, 'post', 'update')
+    assert not has_permission(user, 'comment', 'read')
+
+    # Правило предка сразу видно всем потомкам
+    AccessRoleRule.objects.create(role=base, element=comment, read_permission=True)
+    assert has_permission(user, 'comment', 'read')
+
+    admin.parent = None
+    admin.save()
+    assert not has_permission(user, 'post', 'read')
+    admin.parent = moderator
+    admin.save()
+    assert has_permission(user, 'post', 'update')
+
+    moderator.delete()  # admin становится корнем
+    assert not has_permission(user, 'post', 'read')
+    assert get_matrix()._masks == _fresh_masks()
+
+
+def test_role_cycle(db):
+    first = Role.objects.create(name='first')
+    second = Role.objects.create(name='second', parent=first)
+    first.parent = second
+    with pytest.raises(ValidationError):
+        first.clean()
+
+    # Цикл, записанный в обход clean(), не зацикливает компиляцию
+    Role.objects.filter(pk=first.pk).update(parent=second)
+    AccessRoleRule.objects.create(
+        role=first, element=BusinessElement.objects.create(name='post'), read_permission=True,
+    )
+    get_matrix().load()
+    assert get_matrix().mask(first.pk, 'post') == 1
+
+
+def bench_deep_hierarchy(db, report):
+    parent = None
+    for i in range(DEPTH):
+        parent = Role.objects.create(name=f'level{i}', parent=parent)
+    root = Role.objects.get(name='level0')
+    element = BusinessElement.objects.create(name='post')
+    AccessRoleRule.objects.create(role=root, element=element, read_permission=True)
+
+    start = time.perf_counter()
+    get_matrix().load()
+    load = time.perf_counter() - start
+    leaf = User.objects.create(email='leaf@example.com', first_name='Leaf', role=parent)
+    assert has_permission(leaf, 'post', 'read')
+
+    # Изменение у корня пересчитывает всю цепочку один раз, а не на каждой проверке
+    start = time.perf_counter()
+    AccessRoleRule.objects.filter(role=root).update(delete_permission=True)
+    AccessRoleRule.objects.get(role=root).save()
+    update = time.perf_counter() - start
+    assert has_permission(leaf, 'post', 'delete')
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        has_permission(leaf, 'post', 'read')
+    per_check = (time.perf_counter() - start) / ITERATIONS
+    report.add('role_hierarchy', f'depth={DEPTH}', {
+        'load_ms': load * 1e3, 'update_ms': update * 1e3, 'ns_per_check': round(per_check * 1e9),
+    })
+
+
+def test_ownership_scope(db):
+    element = BusinessElement.objects.create(name='audit_log')
+    viewer, auditor = Role.objects.create(name='viewer'), Role.objects.create(name='auditor')
+    AccessRoleRule.objects.create(role=viewer, element=element, read_permission=True)
+    # Право на все объекты наследуется и включает право на свои
+    AccessRoleRule.objects.create(role=auditor, element=element, read_all_permission=True)
+    admin = Role.objects.create(name='admin', parent=auditor)
+    get_matrix().load()
+    users = [
+        User.objects.create(email=f'{role.name}@example.com', first_name='Scope', role=role)
+        for role in (viewer, auditor, admin)
+    ]
+    outsider = User.objects.create(email='outsider@example.com', first_name='Scope')
+    now = timezone.now()
+    AuthEvent.objects.bulk_create([
+        AuthEvent(user=user, kind=AuthEvent.LOGIN, created_at=now) for user in (*users, outsider)
+    ])
+    events = AuthEvent.objects.all()
+
+    assert [get_scope(user, 'audit_log', 'read') for user in users] == [OWN, ALL, ALL]
+    assert has_permission(users[1], 'audit_log', 'read')
+    assert get_scope(users[0], 'audit_log', 'delete') is None
+    assert list(scope_queryset(users[0], 'audit_log', 'read', events, 'user_id')) == [
+        events.get(user=users[0]),
+    ]
+    assert scope_queryset(users[2], 'audit_log', 'read', events, 'user_id').count() == 4
+    assert not scope_queryset(outsider, 'audit_log', 'read', events, 'user_id').exists()
+    with pytest.raises(ValueError):
+        get_scope(users[0], 'audit_log', 'create')
+
+
+def bench_scope_queryset(db, report):
+    element = BusinessElement.objects.create(name='audit_log')
+    role = Role.objects.create(name='viewer')
+    AccessRoleRule.objects.create(role=role, element=element, read_permission=True)
+    get_matrix().load()
+    user = User.objects.create(email='owner@example.com', first_name='Owner', role=role)
+    other = User.objects.create(email='other@example.com', first_name='Other')
+    now = timezone.now()
+    AuthEvent.objects.bulk_create([
+        AuthEvent(user=user if i % 10 == 0 else other, kind=AuthEvent.LOGIN, created_at=now)
+        for i in range(ROWS)
+    ])
+
+    # Авторизация всего списка одним запросом
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        visible = list(scope_queryset(user, 'audit_log', 'read', AuthEvent.objects.all(), 'user_id'))
+    scoped = time.perf_counter() - start
+    assert len(queries) == 1 and len(visible) == ROWS // 10
+
+    # Базовая линия: выборка всех строк и проверка каждой в Python
+    start = time.perf_counter()
+    checked = [
+        event for event in AuthEvent.objects.all()
+        if event.user_id == user.id and has_permission(user, 'audit_log', 'read')
+    ]
+    per_object = time.perf_counter() - start
+    assert len(checked) == len(visible)
+    report.add('scope_queryset', f'rows={ROWS}', {
+        'sql_filter_ms': scoped * 1e3, 'python_check_ms': per_object * 1e3,
+    })
@@ -0,0 +1,94 @@
+"""
+Регистрация одним INSERT: дубликаты email (без учёта регистра) отсекает
+уникальный индекс, в том числе при параллельных запросах.
+"""
+import asyncio
+import json
+import threading
+
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+
+from .factories import PASSWORD, RoleFactory
+
+PARALLEL = 8
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+def _payload(email, **extra):
+    return json.dumps({'email': email, 'password': PASSWORD, 'first_name': 'Race', **extra})
+
+
+def _register(client, email, **extra):
+    return client.post('/api/register/', _payload(email, **extra), content_type='application/json')
+
+
+def test_email_is_case_insensitive(client, transactional_db):
+    assert _register(client, 'Mixed@Example.com').status_code == 201
+    response = _register(client, 'mixed@example.COM')
+    assert response.status_code == 400
+    assert response.json() == {'error': 'Email already registered'}
+    assert User.objects.count() == 1
+
+    response = client.post(
+        '/api/login/', json.dumps({'email': 'MIXED@example.com', 'password': PASSWORD}),
+        content_type='application/json',
+    )
+    assert response.status_code == 200
+
+
+def test_invalid_role(client, transactional_db):
+    response = _register(client, 'role@example.com', role_id=999)
+    assert response.json() == {'error': 'Invalid role ID'}
+    assert _register(client, 'role@example.com', role_id=RoleFactory().id).status_code == 201
+
+
+def test_register_single_insert(client, transactional_db):
+    with CaptureQueriesContext(connection) as queries:
+        assert _register(client, 'one@example.com').status_code == 201
+    statements = [q['sql'] for q in queries.captured_queries if not q['sql'].startswith(TRANSACTION_STATEMENTS)]
+    assert len(statements) == 1 and statements[0].startswith('INSERT'), statements
+
+
+def test_login_uses_lower_email_lookup(transactional_db):
+    sql = str(User.objects.filter(email__lower='a@example.com').query)
+    assert 'LOWER(' in sql.upper()
+
+
+def test_parallel_duplicate_registrations(transactional_db):
+    barrier = threading.Barrier(PARALLEL)
+    statuses = []
+
+    def register(i):
+        try:
+            barrier.wait()
+            # Разный регистр у каждого потока: индекс всё равно один
+            email = 'race@example.com' if i % 2 else 'RACE@example.com'
+            statuses.append(_register(Client(), email).status_code)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=register, args=(i,)) for i in range(PARALLEL)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] + [400] * (PARALLEL - 1)
+    assert User.objects.filter(email__lower='race@example.com').count() == 1
+
+
+def test_parallel_duplicate_registrations_asgi(transactional_db):
+    async def run():
+        client = AsyncClient()
+        return await asyncio.gather(*(
+            client.post('/api/async/register/', _payload('async@example.com'), content_type='application/json')
+            for _ in range(PARALLEL)
+        ))
+
+    statuses = sorted(response.status_code for response in asyncio.run(run()))
+    assert statuses == [201] + [400] * (PARALLEL - 1)
+    assert User.objects.filter(email__lower='async@example.com').count() == 1
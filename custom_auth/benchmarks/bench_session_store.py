@@ -0,0 +1,236 @@
+"""
+Контрактные тесты хранилищ сессий (все бэкенды ведут себя одинаково)
+и сравнение их скорости на входе и на проверке сессии.
+"""
+import pickle
+import time
+
+import pytest
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User, UserSession
+from accounts.session_store import HybridSessionStore, get_store
+from accounts.utils import record_login
+
+from .conftest import BENCH_REQUESTS
+from .factories import RoleFactory, UserFactory
+from .load import summarize
+
+BACKENDS = ('db', 'cache', 'hybrid')
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, settings, transactional_db):
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'},
+    }
+    # Большой интервал: hybrid пишет в БД только по явному flush()
+    settings.SESSION_STORE = {'BACKEND': request.param, 'FLUSH_INTERVAL': 3600}
+    settings.SESSION_SLIDING = {'ENABLED': True, 'LIFETIME_HOURS': 24, 'RENEW_THRESHOLD_HOURS': 12}
+    store = get_store()
+    yield store
+    store.flush()
+
+
+@pytest.fixture
+def user(transactional_db):
+    return User.objects.select_related('role').get(pk=UserFactory(role=RoleFactory(name='user')).pk)
+
+
+def test_create_and_get(store, user):
+    session = record_login(user, '127.0.0.1', 'bench')
+    loaded = store.get(session.session_key)
+    assert loaded.key_id == session.key_id
+    assert loaded.session_key is None  # Ключ знает только клиент
+    assert loaded.is_active()
+    assert loaded.snapshot.email == user.email
+    assert loaded.snapshot.role_name == 'user'
+    assert store.get('missing') is None
+
+
+def test_key_not_stored(store, user):
+    # В БД и в кеше только хеш ключа: по их дампу сессию не перехватить
+    key = record_login(user, '127.0.0.1', 'bench').session_key
+    store.flush()
+    assert store.get(key) is not None
+    for row in UserSession.objects.values_list('key_digest', flat=True):
+        assert len(row) == 32 and key.encode() not in bytes(row)
+    assert all(key.encode() not in value for value in caches['default']._cache.values())
+    assert key.encode() not in pickle.dumps(store.get(key))
+
+
+def test_get_returns_copy(store, user):
+    session = record_login(user, '127.0.0.1', 'bench')
+    loaded = store.get(session.session_key)
+    loaded.ip_address = '10.0.0.1'
+    assert store.get(session.session_key).ip_address == '127.0.0.1'
+
+
+def test_expire(store, user):
+    key = record_login(user, '127.0.0.1', 'bench').session_key
+    store.expire(store.get(key))
+    loaded = store.get(key)
+    assert loaded is None or not loaded.is_active()
+    store.flush()
+    loaded = store.get(key)
+    assert loaded is None or not loaded.is_active()
+
+
+def test_touch(store, user, settings):
+    key = record_login(user, '127.0.0.1', 'bench').session_key
+    session = store.get(key)
+    assert not store.touch(session)  # Ещё рано продлевать
+
+    settings.SESSION_SLIDING = {'ENABLED': True, 'LIFETIME_HOURS': 48, 'RENEW_THRESHOLD_HOURS': 30}
+    old_expiry = session.expires_at
+    assert store.touch(session)
+    store.flush()
+    assert store.get(key).expires_at > old_expiry
+
+
+def test_refresh_user(store, user):
+    current = record_login(user, '127.0.0.1', 'bench')
+    other = record_login(user, '127.0.0.2', 'bench')
+    store.get(other.session_key)  # Прогреваем кеш
+
+    User.objects.filter(pk=user.pk).update(first_name='Renamed')
+    store.refresh_user(user)
+    assert store.get(other.session_key).snapshot.first_name == 'Renamed'
+    assert store.get(current.session_key).snapshot.first_name == 'Renamed'
+
+
+def test_list_and_revoke(store, user):
+    sessions = [record_login(user, f'127.0.0.{i}', 'bench') for i in range(3)]
+    listed = store.list_sessions(user)
+    assert [s.key_id for s in listed] == [s.key_id for s in reversed(sessions)]
+
+    assert store.revoke(user, sessions[0].key_id)
+    assert not store.revoke(user, sessions[0].key_id)
+    assert not store.revoke(user, 'unknown')
+    assert len(store.list_sessions(user)) == 2
+
+    current = store.get(sessions[2].session_key)
+    assert store.revoke_others(user, keep=current) == 1
+    assert [s.key_id for s in store.list_sessions(user)] == [current.key_id]
+    revoked = store.get(sessions[1].session_key)
+    assert revoked is None or not revoked.is_active()
+
+
+def test_session_limit(store, user, settings):
+    settings.SESSION_STORE = {**settings.SESSION_STORE, 'MAX_PER_USER': 2}
+    store = get_store()
+    sessions = [record_login(user, '127.0.0.1', 'bench') for _ in range(4)]
+    assert [s.key_id for s in store.list_sessions(user)] == [sessions[3].key_id, sessions[2].key_id]
+    oldest = store.get(sessions[0].session_key)
+    assert oldest is None or not oldest.is_active()
+
+
+def test_session_limit_queries(transactional_db, settings, user):
+    # Лимит на входе в БД: один SELECT ключей старых сессий сверх INSERT
+    store = get_store()
+    record_login(user, '127.0.0.1', 'bench')
+    with CaptureQueriesContext(connection) as unlimited:
+        store.create(user, '127.0.0.1', 'bench')
+    settings.SESSION_STORE = {'BACKEND': 'db', 'MAX_PER_USER': 5}
+    store = get_store()
+    with CaptureQueriesContext(connection) as limited:
+        store.create(user, '127.0.0.1', 'bench')
+    assert len(limited) == len(unlimited) + 1
+
+
+def test_revoke_single_update(transactional_db, user):
+    store = get_store()
+    session = record_login(user, '127.0.0.1', 'bench')
+    other = UserFactory()
+    with CaptureQueriesContext(connection) as queries:
+        assert not store.revoke(other, session.key_id)  # Чужую сессию не завершить
+        assert store.revoke(user, session.key_id)
+    assert [q['sql'].split()[0] for q in queries.captured_queries] == ['UPDATE', 'UPDATE']
+    assert store.get(session.session_key) is None or not store.get(session.session_key).is_active()
+    assert not store.revoke(user, 'not-hex')
+
+
+def test_sessions_api(client, transactional_db, user):
+    keys = [record_login(user, '127.0.0.1', f'agent{i}').session_key for i in range(3)]
+    headers = {'HTTP_AUTHORIZATION': f'Session {keys[2]}'}
+
+    sessions = client.get('/api/sessions/', **headers).json()['sessions']
+    assert [s['user_agent'] for s in sessions] == ['agent2', 'agent1', 'agent0']
+    assert [s['current'] for s in sessions] == [True, False, False]
+
+    response = client.post(f'/api/sessions/{sessions[2]["id"]}/revoke/', **headers)
+    assert response.status_code == 200
+    assert client.post(f'/api/sessions/{sessions[2]["id"]}/revoke/', **headers).status_code == 404
+
+    response = client.post('/api/sessions/revoke-others/', **headers)
+    assert response.json()['revoked'] == 1
+    assert client.get('/api/me/', HTTP_AUTHORIZATION=f'Session {keys[1]}').status_code == 401
+    assert len(client.get('/api/sessions/', **headers).json()['sessions']) == 1
+
+
+def test_hybrid_write_behind(transactional_db, settings, user):
+    settings.SESSION_STORE = {'BACKEND': 'hybrid', 'FLUSH_INTERVAL': 3600}
+    store = get_store()
+    assert isinstance(store, HybridSessionStore)
+    sessions = [record_login(user, '127.0.0.1', 'bench') for _ in range(5)]
+    assert not UserSession.objects.exists()
+    assert store.flush() == 5
+    assert UserSession.objects.count() == 5
+
+    store.expire(store.get(sessions[0].session_key))
+    store.flush()
+    assert not UserSession.objects.get(key_digest=sessions[0].key_digest).is_active()
+    assert UserSession.objects.get(key_digest=sessions[0].key_digest).session_key is None
+
+
+def test_hybrid_expire_outlives_tombstone(transactional_db, settings, user):
+    # Пока завершение не записано в БД, промах кеша не воскрешает сессию
+    settings.SESSION_STORE = {'BACKEND': 'hybrid', 'FLUSH_INTERVAL': 3600}
+    store = get_store()
+    session = record_login(user, '127.0.0.1', 'bench')
+    store.flush()
+    store.expire(store.get(session.session_key))
+    store.cache.delete(store._key(session.key_id))  # Надгробие истекло
+    loaded = store.get(session.session_key)
+    assert loaded is None or not loaded.is_active()
+    assert store.get(session.session_key) is None or not store.get(session.session_key).is_active()
+
+
+def test_hybrid_flushes_on_timer(transactional_db, settings, user):
+    settings.SESSION_STORE = {'BACKEND': 'hybrid', 'FLUSH_INTERVAL': 0.05}
+    store = get_store()
+    session = record_login(user, '127.0.0.1', 'bench')
+    store.expire(store.get(session.session_key))
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        row = UserSession.objects.filter(key_digest=session.key_digest).first()
+        if row is not None and not row.is_active():
+            break
+        time.sleep(0.02)
+    assert not row.is_active()  # Записано без новых записей в хранилище
+    store.stop()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def bench_session_store(backend, transactional_db, settings, report):
+    settings.SESSION_STORE = {'BACKEND': backend}
+    store = get_store()
+    user = User.objects.select_related('role').get(pk=UserFactory(role=RoleFactory(name='user')).pk)
+
+    timings = []
+    keys = []
+    for _ in range(BENCH_REQUESTS):
+        start = time.perf_counter()
+        keys.append(record_login(user, '127.0.0.1', 'bench').session_key)
+        timings.append(time.perf_counter() - start)
+    report.add('session_create', backend, summarize(timings, sum(timings), 0))
+
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        assert store.get(key) is not None
+        timings.append(time.perf_counter() - start)
+    report.add('session_get', backend, summarize(timings, sum(timings), 0))
+    store.flush()
@@ -0,0 +1,113 @@
+"""
+Общие фикстуры набора бенчмарков.
+
+Размер данных и нагрузки задаётся переменными окружения:
+BENCH_USERS, BENCH_SESSIONS, BENCH_REQUESTS, BENCH_CONCURRENCY.
+Результаты пишутся в BENCH_OUTPUT (по умолчанию bench_results.json)
+для сравнения между коммитами.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+import pytest
+
+from accounts.models import User, UserSession
+
+from .factories import (
+    AccessRoleRuleFactory, BusinessElementFactory, RoleFactory, UserFactory, UserSessionFactory,
+)
+
+BENCH_USERS = int(os.environ.get('BENCH_USERS', 200))
+BENCH_SESSIONS = int(os.environ.get('BENCH_SESSIONS', 1000))
+BENCH_REQUESTS = int(os.environ.get('BENCH_REQUESTS', 200))
+BENCH_CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', 8))
+BENCH_OUTPUT = os.environ.get('BENCH_OUTPUT', 'bench_results.json')
+# По умолчанию дешёвый хешер, чтобы мерить накладные расходы приложения, а не PBKDF2
+BENCH_REAL_HASHER = os.environ.get('BENCH_REAL_HASHER') == '1'
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix, tmp_path_factory):
+    """SQLite в памяти не переносит конкурентную запись из потоков live-сервера"""
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'].endswith('sqlite3'):
+        database.setdefault('TEST', {})['NAME'] = str(tmp_path_factory.mktemp('db') / 'bench.sqlite3')
+        database.setdefault('OPTIONS', {})['timeout'] = 30
+
+
+@pytest.fixture(autouse=True)
+def bench_settings(settings):
+    if not BENCH_REAL_HASHER:
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    settings.RATE_LIMIT = {'ENABLED': False}
+    # Журнал пишется фоновым потоком вне транзакции теста; его тесты включают его сами
+    settings.AUDIT_LOG = {'ENABLED': False}
+    settings.ALLOWED_HOSTS = ['*']
+    settings.DEBUG = False
+    return settings
+
+
+@pytest.fixture
+def seed(transactional_db):
+    """Роли, элементы, правила, BENCH_USERS пользователей и BENCH_SESSIONS сессий"""
+    roles = [RoleFactory(name=name) for name in ('admin', 'moderator', 'user')]
+    elements = [BusinessElementFactory() for _ in range(20)]
+    for role in roles:
+        for element in elements:
+            AccessRoleRuleFactory(role=role, element=element)
+
+    users = User.objects.bulk_create(
+        [UserFactory.build(role=roles[i % len(roles)]) for i in range(BENCH_USERS)]
+    )
+    sessions = UserSession.objects.bulk_create(
+        [UserSessionFactory.build(user=random.choice(users)) for _ in range(BENCH_SESSIONS)]
+    )
+    return {'roles': roles, 'elements': elements, 'users': users, 'sessions': sessions}
+
+
+class Report:
+    def __init__(self):
+        self.results = []
+
+    def add(self, scenario, transport, stats, **extra):
+        record = {'scenario': scenario, 'transport': transport, **stats, **extra}
+        self.results.append(record)
+        print(f'\n{scenario} [{transport}]: {stats}')
+        return record
+
+    def write(self, path):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=False
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        payload = {
+            'commit': commit,
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'config': {
+                'users': BENCH_USERS,
+                'sessions': BENCH_SESSIONS,
+                'requests': BENCH_REQUESTS,
+                'concurrency': BENCH_CONCURRENCY,
+                'real_hasher': BENCH_REAL_HASHER,
+            },
+            'results': self.results,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+
+
+@pytest.fixture(scope='session')
+def report():
+    report = Report()
+    yield report
+    if report.results:
+        report.write(BENCH_OUTPUT)
@@ -0,0 +1,70 @@
+import factory
+from django.contrib.auth.hashers import make_password
+
+from accounts.models import AccessRoleRule, BusinessElement, Role, User, UserSession
+from accounts.utils import generate_session_key, get_expiration_time
+
+PASSWORD = 'bench-password'
+
+
+class RoleFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Role
+        django_get_or_create = ('name',)
+
+    name = factory.Sequence(lambda n: f'role{n}')
+
+
+class BusinessElementFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = BusinessElement
+        django_get_or_create = ('name',)
+
+    name = factory.Sequence(lambda n: f'element{n}')
+
+
+class AccessRoleRuleFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = AccessRoleRule
+
+    role = factory.SubFactory(RoleFactory)
+    element = factory.SubFactory(BusinessElementFactory)
+    read_permission = True
+    create_permission = factory.Faker('pybool')
+    update_permission = factory.Faker('pybool')
+    delete_permission = False
+
+
+class UserFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = User
+
+    email = factory.Sequence(lambda n: f'user{n}@example.com')
+    first_name = factory.Faker('first_name')
+    last_name = factory.Faker('last_name')
+    role = factory.SubFactory(RoleFactory)
+    # Хеш считается один раз на класс: засев десятков тысяч строк не упирается в PBKDF2
+    password_hash = factory.LazyFunction(lambda: _password_hash())
+
+
+class UserSessionFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = UserSession
+
+    user = factory.SubFactory(UserFactory)
+    session_key = factory.LazyFunction(generate_session_key)
+    ip_address = factory.Faker('ipv4')
+    user_agent = factory.Faker('user_agent')
+    expires_at = factory.LazyFunction(get_expiration_time)
+
+
+_hash_cache = {}
+
+
+def _password_hash():
+    from django.conf import settings
+
+    hasher = settings.PASSWORD_HASHERS[0]
+    if hasher not in _hash_cache:
+        _hash_cache[hasher] = make_password(PASSWORD)
+    return _hash_cache[hasher]
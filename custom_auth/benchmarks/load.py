@@ -0,0 +1,59 @@
+"""
+Генерация нагрузки и подсчёт статистики: p50/p99 задержки и req/s.
+"""
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def summarize(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(p):
+        if not count:
+            return None
+        return latencies[min(count - 1, int(round(p / 100 * (count - 1))))]
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'p50_ms': round(percentile(50) * 1000, 3) if count else None,
+        'p99_ms': round(percentile(99) * 1000, 3) if count else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if count else None,
+        'rps': round(count / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_load(request_fn, total, concurrency):
+    """
+    Выполняет request_fn(i) total раз в concurrency потоках.
+    request_fn возвращает True при успешном ответе.
+    """
+    def timed(i):
+        start = time.perf_counter()
+        ok = request_fn(i)
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+    return summarize([r[0] for r in results], elapsed, sum(1 for r in results if not r[1]))
+
+
+async def run_async_load(request_fn, total, concurrency):
+    """То же для корутин: не больше concurrency запросов одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i):
+        async with semaphore:
+            start = time.perf_counter()
+            ok = await request_fn(i)
+            return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return summarize([r[0] for r in results], elapsed, sum(1 for r in results if not r[1]))
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.instrumentation.AuthMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,11 +54,88 @@ JWT_CONFIG = {
     'ACCESS_TOKEN_LIFETIME_HOURS': 24,  # Время жизни access токена
     'REFRESH_TOKEN_LIFETIME_DAYS': 30,  # Время жизни refresh токена
     'AUTH_HEADER_TYPES': ('Bearer',),  # Тип заголовка для авторизации
+    'REVOCATION_CACHE': 'default',  # Алиас из CACHES для списка отозванных токенов
 }
 
+# Что выдаёт login_user: 'session' (UserSession в БД) или 'jwt' (access/refresh токены).
+# require_auth принимает оба вида заголовков независимо от режима.
+AUTH_MODE = 'session'
+
 # Настройки сессии
 SESSION_COOKIE_AGE = 86400  # Время жизни сессии в секундах (24 часа)
 
+# last_login обновляется не чаще, чем раз в указанное число секунд на пользователя
+LAST_LOGIN_UPDATE_INTERVAL = 60
+
+# Кеш сессий для require_auth
+SESSION_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,  # Размер LRU в памяти каждого процесса
+    'TTL': 300,  # Максимальное время жизни записи в секундах (не больше expires_at)
+    'SHARED_BACKEND': None,  # Алиас из CACHES (например, Redis) для общего кеша воркеров
+}
+
+# Хранилище сессий: 'db' (UserSession в БД + SESSION_CACHE), 'cache' (только кеш)
+# или 'hybrid' (кеш, запись в БД пачками раз в FLUSH_INTERVAL секунд)
+SESSION_STORE = {
+    'BACKEND': 'db',
+    'CACHE': 'default',  # Алиас из CACHES для 'cache' и 'hybrid'
+    'FLUSH_INTERVAL': 5,
+    'MAX_PENDING': 1000,
+    'MAX_PER_USER': None,  # Лимит одновременных сессий пользователя (None — без лимита)
+}
+
+# Журнал событий аутентификации (accounts/audit.py): буфер в памяти,
+# запись в БД фоновым потоком пачками по BATCH_SIZE или раз в FLUSH_INTERVAL_MS
+AUDIT_LOG = {
+    'ENABLED': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL_MS': 1000,
+    'MAX_PENDING': 10000,
+    'OVERFLOW': 'drop',  # 'drop' — отбросить и посчитать, 'block' — ждать места в буфере
+}
+
+# Разбор тел запросов и JSON-ответы view (accounts/http.py)
+JSON_API = {
+    'MAX_BODY_SIZE': 64 * 1024,  # Тела больше отклоняются с 413 до чтения
+    'FAST_ENCODER': True,  # orjson, если установлен; иначе стандартный json
+}
+
+# Ограничение попыток входа (проверяется до check_password)
+RATE_LIMIT = {
+    'ENABLED': True,
+    'LOGIN_PER_IP': (20, 60),  # (попыток, окно в секундах) с одного REMOTE_ADDR
+    'FAILURES_PER_EMAIL': (5, 300),  # Неудачных попыток на один email
+    'MAX_KEYS': 100000,
+    'SHARED_BACKEND': None,  # Алиас из CACHES для общих счётчиков всех воркеров
+}
+
+# Метрики аутентификации по фазам запроса, выдаются на /api/metrics/
+AUTH_METRICS = {
+    'ENABLED': False,
+}
+
+# Пул для хеширования паролей в асинхронных view (accounts/async_views.py)
+PASSWORD_HASHING_POOL = {
+    'KIND': 'thread',  # 'thread' или 'process'
+    'WORKERS': 4,
+    'MAX_PENDING': 64,  # При переполнении очереди ответ 503 с Retry-After
+    'RETRY_AFTER': 1,
+}
+
+# Скользящий срок жизни сессии: активные пользователи не разлогиниваются.
+# Продления копятся в памяти и пишутся в БД одним UPDATE раз в FLUSH_INTERVAL секунд.
+SESSION_SLIDING = {
+    'ENABLED': False,
+    'LIFETIME_HOURS': 24,
+    'RENEW_THRESHOLD_HOURS': 12,
+    'FLUSH_INTERVAL': 30,
+}
+
+# Как часто (в секундах) каждый процесс перечитывает матрицу прав из БД.
+# Изменения в этом же процессе применяются сразу через сигналы.
+PERMISSION_MATRIX_RELOAD_INTERVAL = 60
+
 ROOT_URLCONF = 'custom_auth.urls'
 
 TEMPLATES = [
@@ -115,6 +193,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Хеширование паролей. Первый хешер используется для новых паролей,
+# остальные — для проверки старых хешей, которые перехешируются при входе.
+# Для scrypt (memory-hard) поставьте TunedScryptPasswordHasher первым.
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'accounts.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Параметры стоимости; подбираются командой `manage.py calibrate_hasher`.
+# None — значение Django по умолчанию.
+PASSWORD_HASH_ITERATIONS = None
+PASSWORD_SCRYPT_WORK_FACTOR = None
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 